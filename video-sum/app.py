@@ -1,13 +1,29 @@
 from flask import Flask, request, jsonify
 import os
-from modules.video_processing import get_audio, get_frames
-from modules.audio_transcriber import transcribe_audio
-from modules.image_processor import process_frames
-from modules.summarizer import get_summary
-from modules.database import store_knowledge, fetch_relevant_chunks,fetch_summary
-from modules.ollama_helper import get_ollama_response
+from modules.database import fetch_relevant_chunks,fetch_summary
+from modules.ollama_helper import get_ollama_response, stream_ollama_response, FALLBACK_ANSWER
+from modules.streaming import wants_stream, sse_response
+from modules import answer_cache
+from config.settings import embedder, WARM_UP_SERVICES
+from config.services import warm_up
+from modules.embedding_service import EmbeddingQueueFull
+from modules.job_queue import enqueue, start_workers
+from modules.job_routes import jobs_blueprint
+from modules.metrics_routes import metrics_blueprint
+from modules.search_routes import search_blueprint
+from modules.stats_routes import stats_blueprint
+from modules.metrics import log_event
+from modules.workspace import unique_upload_path
 
 app = Flask(__name__)
+app.register_blueprint(jobs_blueprint)
+app.register_blueprint(metrics_blueprint)
+app.register_blueprint(search_blueprint)
+app.register_blueprint(stats_blueprint)
+
+# Build the configured services before serving (and before forking job workers)
+if WARM_UP_SERVICES:
+    warm_up(*WARM_UP_SERVICES)
 
 @app.route("/")
 def home():
@@ -20,24 +36,15 @@ def upload_video():
 
     video = request.files["video"]
     video_filename = video.filename
-    video_path = os.path.join("static/video", video_filename)
+    video_path = unique_upload_path("static/video", video_filename)
     video.save(video_path)
 
-    get_audio(video_path)
-    audio_path = "static/audio/output.wav"
-    transcription = transcribe_audio(audio_path)
-
-    print("Transcription    "+transcription)
-
-    get_frames(video_path)
-    frame_data = process_frames(video_path,transcription)
-
-    os.remove(video_path)
-
-    summary = get_summary(transcription)
-    store_knowledge(video_filename, transcription, frame_data, summary)
+    job_id = enqueue("modules.pipeline:process_video", {
+        "video_path": video_path,
+        "video_filename": video_filename,
+    }, uploads=[video_path])
 
-    return jsonify({"message": "Video processed successfully!", "summary": summary}), 200
+    return jsonify({"message": "Video queued for processing!", "job_id": job_id, "status_url": f"/jobs/{job_id}"}), 202
 
 @app.route("/ask", methods=["POST"])
 def ask():
@@ -48,23 +55,44 @@ def ask():
         return jsonify({"error": "Question or video filename missing!"}), 400
 
     try:
+        # Reuse the answer to a near-identical question about the same video
+        document = ("video", video_filename)
+        question_embedding = embedder.encode(user_question)
+        cached_answer = answer_cache.lookup(document, question_embedding)
+        stream = wants_stream(request)
+        if cached_answer is not None:
+            if stream:
+                return sse_response([cached_answer], cached=True)
+            return jsonify({"answer": cached_answer, "cached": True}), 200
+
         # Fetch the summary and relevant chunks from the database
-        context = fetch_relevant_chunks(video_filename, user_question)
-        print("context"+context)
-        print("video_filename"+video_filename)
+        context = fetch_relevant_chunks(video_filename, user_question, question_embedding=question_embedding)
         summary=fetch_summary(video_filename)
+        log_event("retrieval", video_filename=video_filename, context_chars=len(context))
 
-        print(summary)
         # Generate the response using Ollama
         content = f"Context:\n{context}\n\nSummary:\n{summary}\n\nQuestion: {user_question}\n\nAnswer:"
+        if stream:
+            def remember(answer):
+                answer_cache.store(document, question_embedding, answer)
+            return sse_response(stream_ollama_response(content), on_complete=remember)
+
         gemini_response = get_ollama_response(content)
+        answer = gemini_response["message"]["content"]
+        if answer != FALLBACK_ANSWER:
+            answer_cache.store(document, question_embedding, answer)
 
-        return jsonify({"answer": gemini_response["message"]["content"]}), 200
+        return jsonify({"answer": answer}), 200
+
+    except EmbeddingQueueFull as e:
+        return jsonify({"error": str(e)}), 503
 
     except Exception as e:
 
         return jsonify({"error": f"Error occurred: {str(e)}"}), 500
     
-
 if __name__ == "__main__":
+    # The debug reloader re-runs this module in a child process; start workers only once
+    if os.environ.get("WERKZEUG_RUN_MAIN") != "true":
+        start_workers()
     app.run(debug=True)
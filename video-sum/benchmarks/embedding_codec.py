@@ -0,0 +1,32 @@
+import json
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from modules.embedding_codec import encode_embedding, decode_embedding
+
+
+def bench(name, encode, decode, vectors):
+    payloads = [encode(v) for v in vectors]
+    start = time.perf_counter()
+    decoded = [decode(p) for p in payloads]
+    elapsed = time.perf_counter() - start
+    size = sum(len(p) for p in payloads) / len(payloads)
+    error = max(float(np.abs(d - v).max()) for d, v in zip(decoded, vectors))
+    print(f"{name:<16} {size:>8.0f} B/row {elapsed / len(vectors) * 1e6:>8.2f} us/decode  max err {error:.2e}")
+
+
+if __name__ == "__main__":
+    dim = int(sys.argv[1]) if len(sys.argv) > 1 else 384
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((rows, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    print(f"{rows} x {dim}-dim embeddings")
+    bench("json", lambda v: json.dumps(v.tolist()), lambda p: np.array(json.loads(p), dtype=np.float32), vectors)
+    for codec in ["float32", "float16", "int8"]:
+        for transport in ["base64", "bytea"]:
+            bench(f"{codec}/{transport}", lambda v: encode_embedding(v, codec, transport), decode_embedding, vectors)
@@ -0,0 +1,246 @@
+import json
+import random
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# Seconds of artificial latency per service, adjustable at runtime via configure()
+LATENCY = {"groq": 0.0, "ollama": 0.0, "supabase": 0.0}
+
+WORDS = (
+    "the lecture covers vectors matrices gradients models training data loss function "
+    "network layer attention token embedding retrieval summary example result method"
+).split()
+
+_tables = {}
+_next_id = {}
+_db_lock = threading.Lock()
+
+
+def configure(**latency):
+    """Sets per-service latency in seconds, e.g. configure(groq=0.3, ollama=0.8)."""
+    LATENCY.update(latency)
+
+
+def reset_tables():
+    with _db_lock:
+        _tables.clear()
+        _next_id.clear()
+
+
+def _sentences(count, seed):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14))).capitalize() + "." for _ in range(count)]
+
+
+def _parse_filters(query):
+    """PostgREST-style column=op.value filters plus select/order/limit/offset/on_conflict."""
+    params = {k: v[-1] for k, v in parse_qs(query, keep_blank_values=True).items()}
+    special = {k: params.pop(k) for k in ("select", "order", "limit", "offset", "on_conflict", "columns") if k in params}
+    filters = []
+    for column, expr in params.items():
+        op, _, value = expr.partition(".")
+        if op in _OPERATORS:
+            filters.append((column, op, value))
+    return filters, special
+
+
+_OPERATORS = {
+    "eq": lambda a, b: str(a) == b,
+    "neq": lambda a, b: str(a) != b,
+    "gt": lambda a, b: a is not None and float(a) > float(b),
+    "gte": lambda a, b: a is not None and float(a) >= float(b),
+    "lt": lambda a, b: a is not None and float(a) < float(b),
+    "lte": lambda a, b: a is not None and float(a) <= float(b),
+    "is": lambda a, b: a is None if b == "null" else str(a).lower() == b,
+}
+
+
+def _matches(row, filters):
+    return all(_OPERATORS[op](row.get(column), value) for column, op, value in filters)
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    """Answers just enough of the Groq, Ollama and Supabase REST APIs for the pipeline."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+
+    def _json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, content_type, lines):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for line in lines:
+            data = line.encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _route(self, method):
+        path = urlparse(self.path).path
+        if path.startswith("/openai/v1/audio/transcriptions"):
+            return self._groq_transcription()
+        if path.startswith("/openai/v1/chat/completions"):
+            return self._groq_chat()
+        if path.startswith("/api/chat"):
+            return self._ollama_chat()
+        if path.startswith("/rest/v1/"):
+            return self._supabase(method, path[len("/rest/v1/"):])
+        self._json(404, {"error": f"No fake for {method} {path}"})
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_PATCH(self):
+        self._route("PATCH")
+
+    def do_DELETE(self):
+        self._route("DELETE")
+
+    # --- Groq -----------------------------------------------------------------
+
+    def _groq_transcription(self):
+        body = self._body()
+        time.sleep(LATENCY["groq"])
+        # Roughly one sentence per 5 s of 16 kHz mono audio; FLAC is about half the raw size
+        seconds = max(1.0, len(body) / 16000)
+        sentences = _sentences(max(1, int(seconds / 5)), len(body))
+        step = seconds / len(sentences)
+        segments = [
+            {"id": i, "start": i * step, "end": (i + 1) * step, "text": " " + text}
+            for i, text in enumerate(sentences)
+        ]
+        self._json(200, {"text": " ".join(sentences), "segments": segments, "duration": seconds, "language": "en"})
+
+    def _groq_chat(self):
+        request = json.loads(self._body() or b"{}")
+        time.sleep(LATENCY["groq"])
+        prompt = " ".join(m.get("content", "") for m in request.get("messages", []) if isinstance(m.get("content"), str))
+        answer = " ".join(_sentences(6, len(prompt)))
+        if request.get("stream"):
+            chunks = [
+                "data: " + json.dumps({"id": "fake", "object": "chat.completion.chunk", "created": 0, "model": request.get("model"),
+                                       "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}) + "\n\n"
+                for word in answer.split()
+            ]
+            return self._stream("text/event-stream", chunks + ["data: [DONE]\n\n"])
+        self._json(200, {
+            "id": "fake", "object": "chat.completion", "created": 0, "model": request.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(answer) // 4, "total_tokens": (len(prompt) + len(answer)) // 4},
+        })
+
+    # --- Ollama ---------------------------------------------------------------
+
+    def _ollama_chat(self):
+        request = json.loads(self._body() or b"{}")
+        time.sleep(LATENCY["ollama"])
+        messages = request.get("messages", [])
+        prompt = " ".join(m.get("content", "") for m in messages)
+        images = sum(len(m.get("images") or []) for m in messages)
+        answer = " ".join(_sentences(4 + images, len(prompt)))
+        if request.get("stream", True):
+            lines = [
+                json.dumps({"model": request.get("model"), "created_at": "1970-01-01T00:00:00Z",
+                            "message": {"role": "assistant", "content": word + " "}, "done": False}) + "\n"
+                for word in answer.split()
+            ]
+            lines.append(json.dumps({"model": request.get("model"), "created_at": "1970-01-01T00:00:00Z",
+                                     "message": {"role": "assistant", "content": ""}, "done": True}) + "\n")
+            return self._stream("application/x-ndjson", lines)
+        self._json(200, {"model": request.get("model"), "created_at": "1970-01-01T00:00:00Z",
+                         "message": {"role": "assistant", "content": answer}, "done": True})
+
+    # --- Supabase REST (PostgREST) --------------------------------------------
+
+    def _supabase(self, method, table):
+        filters, special = _parse_filters(urlparse(self.path).query)
+        body = self._body()
+        time.sleep(LATENCY["supabase"])
+        with _db_lock:
+            rows = _tables.setdefault(table, [])
+            if method == "GET":
+                result = [row for row in rows if _matches(row, filters)]
+                if "order" in special:
+                    column, _, direction = special["order"].partition(".")
+                    result.sort(key=lambda row: row.get(column), reverse=direction == "desc")
+                offset = int(special.get("offset", 0))
+                limit = special.get("limit")
+                range_header = self.headers.get("Range")
+                if range_header:
+                    lo, _, hi = range_header.partition("-")
+                    offset, limit = int(lo), int(hi) - int(lo) + 1
+                result = result[offset:offset + int(limit)] if limit is not None else result[offset:]
+                if "select" in special and special["select"] != "*":
+                    columns = [c.strip() for c in special["select"].split(",")]
+                    result = [{c: row.get(c) for c in columns} for row in result]
+                return self._json(200, result)
+
+            if method == "POST":
+                payload = json.loads(body or b"[]")
+                payload = payload if isinstance(payload, list) else [payload]
+                conflict = special.get("on_conflict")
+                merge = "merge-duplicates" in self.headers.get("Prefer", "")
+                written = []
+                for item in payload:
+                    existing = None
+                    if merge and conflict:
+                        keys = [c.strip() for c in conflict.split(",")]
+                        existing = next((r for r in rows if all(r.get(k) == item.get(k) for k in keys)), None)
+                    if existing is not None:
+                        existing.update(item)
+                        written.append(existing)
+                    else:
+                        _next_id[table] = _next_id.get(table, 0) + 1
+                        row = {"id": _next_id[table], **item}
+                        rows.append(row)
+                        written.append(row)
+                return self._json(201, written)
+
+            if method == "PATCH":
+                changes = json.loads(body or b"{}")
+                updated = [row for row in rows if _matches(row, filters)]
+                for row in updated:
+                    row.update(changes)
+                return self._json(200, updated)
+
+            if method == "DELETE":
+                deleted = [row for row in rows if _matches(row, filters)]
+                _tables[table] = [row for row in rows if not _matches(row, filters)]
+                return self._json(200, deleted)
+
+
+def start(port=0):
+    """Starts the fake services on a background thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    server, url = start(int(sys.argv[1]) if len(sys.argv) > 1 else 8700)
+    print(f"Fake Groq/Ollama/Supabase listening on {url}")
+    threading.Event().wait()
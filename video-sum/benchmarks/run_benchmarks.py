@@ -0,0 +1,258 @@
+"""End-to-end and per-module benchmarks against local fakes of Groq, Ollama and Supabase.
+
+    python benchmarks/run_benchmarks.py --latency groq=0.2,ollama=0.5,supabase=0.02
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/<old commit>.json
+
+Results are written as JSON (benchmarks/results/<commit>.json by default) so runs
+from different commits can be compared.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_services
+import synthetic
+
+
+class HashEmbedder:
+    """Deterministic stand-in for the SentenceTransformer when the model is unavailable."""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def encode(self, sentences, batch_size=None, **kwargs):
+        if isinstance(sentences, str):
+            return self._vector(sentences)
+        return np.array([self._vector(s) for s in sentences], dtype=np.float32).reshape(-1, self.dim)
+
+
+def summarize(latencies):
+    values = np.array(latencies) * 1000
+    total = sum(latencies)
+    return {
+        "runs": len(latencies),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "min_ms": float(values.min()),
+        "throughput_per_s": len(latencies) / total if total else None,
+    }
+
+
+def measure(results, name, fn, runs=1):
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    results[name] = summarize(latencies)
+    print(f"{name:<45} p50 {results[name]['p50_ms']:10.1f} ms   p95 {results[name]['p95_ms']:10.1f} ms")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def configure_environment(base_url, scratch):
+    """Points every client at the fakes and every local store at scratch space.
+
+    Must run before config.settings is imported.
+    """
+    os.environ.update({
+        "GROQ_BASE_URL": base_url,
+        "GROQ_API_KEY": "fake",
+        "OLLAMA_HOST": base_url,
+        "SUPABASE_URL": base_url,
+        # supabase-py only accepts keys shaped like a JWT
+        "SUPABASE_KEY": "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYmVuY2gifQ.ZmFrZQ",
+        "JOBS_DB": os.path.join(scratch, "jobs.db"),
+        "CACHE_DIR": os.path.join(scratch, "cache"),
+        "METRICS_DIR": os.path.join(scratch, "metrics"),
+        "INDEX_STAMP_DIR": os.path.join(scratch, "index_stamps"),
+        "CORPUS_INDEX_DIR": os.path.join(scratch, "corpus_index"),
+        "CHECKPOINT_DIR": os.path.join(scratch, "checkpoints"),
+        "SCRATCH_DIR": os.path.join(scratch, "work"),
+    })
+
+
+def module_benchmarks(results, inputs, runs):
+    from modules.data_chunk import chunk_text
+    from modules.embedding_codec import encode_embedding, decode_embeddings
+    from modules.vector_index import VectorIndex
+    from modules.video_processing import extract_media
+    from modules.audio_transcriber import transcribe_audio_segments
+    from modules.image_processor import process_frames
+    from modules.database import store_knowledge, fetch_relevant_chunks
+    from modules.workspace import job_workspace
+
+    rng = np.random.default_rng(0)
+    transcript = " ".join(synthetic.WORDS[i % len(synthetic.WORDS)] + ("." if i % 12 == 11 else "") for i in range(200_000))
+    measure(results, "module.chunk_text.1MB", lambda: chunk_text(transcript), runs)
+
+    vectors = rng.standard_normal((10_000, 384)).astype(np.float32)
+    payloads = [encode_embedding(v) for v in vectors]
+    measure(results, "module.decode_embeddings.10k", lambda: decode_embeddings(payloads), runs)
+
+    index = VectorIndex()
+    index.add(rng.standard_normal((50_000, 384)).astype(np.float32), [str(i) for i in range(50_000)])
+    query = rng.standard_normal(384).astype(np.float32)
+    measure(results, "module.vector_index.search.50k", lambda: index.search(query, 5), runs * 20)
+
+    chunks = chunk_text(transcript)
+    hybrid = VectorIndex()
+    hybrid.add(rng.standard_normal((len(chunks), 384)).astype(np.float32), chunks)
+    measure(results, f"module.vector_index.hybrid_search.{len(chunks)}", lambda: hybrid.hybrid_search(
+        "gradient optimization of the network", query, 5), runs * 20)
+
+    for name, path in inputs.items():
+        if not name.startswith("video_"):
+            continue
+        with job_workspace("bench-") as work_dir:
+            outputs = {}
+            measure(results, f"module.extract_media.{name}", lambda: outputs.update(zip(
+                ("audio", "frames", "stats"), extract_media(path, work_dir))))
+            measure(results, f"module.transcribe_audio.{name}", lambda: outputs.update(zip(
+                ("transcription", "segments"), transcribe_audio_segments(outputs["audio"], work_dir))))
+            measure(results, f"module.process_frames.{name}", lambda: outputs.update(
+                frame_data=process_frames(outputs["frames"], outputs["transcription"], outputs["segments"])))
+        measure(results, f"module.store_knowledge.{name}", lambda: store_knowledge(
+            f"bench-{name}.mp4", outputs["transcription"], outputs["frame_data"], "summary", outputs["segments"]))
+        measure(results, f"module.fetch_relevant_chunks.{name}", lambda: fetch_relevant_chunks(
+            f"bench-{name}.mp4", "what does the lecture say about gradients"), runs * 5)
+
+
+def endpoint_benchmarks(results, inputs, runs):
+    from modules.job_queue import run_pending_jobs
+    import app as video_app
+    import pdf as pdf_app
+
+    video_client = video_app.app.test_client()
+    pdf_client = pdf_app.app.test_client()
+
+    def upload_video(path, filename):
+        with open(path, "rb") as f:
+            data = {"video": (io.BytesIO(f.read()), filename)}
+        response = video_client.post("/upload_video", data=data, content_type="multipart/form-data")
+        assert response.status_code == 202, response.get_json()
+        run_pending_jobs()
+
+    def upload_pdf(path, filename):
+        with open(path, "rb") as f:
+            data = {"file": (io.BytesIO(f.read()), filename)}
+        response = pdf_client.post("/pdf_query", data=data, content_type="multipart/form-data")
+        assert response.status_code == 202, response.get_json()
+        run_pending_jobs()
+
+    counter = iter(range(10 ** 9))
+
+    def unique_question():
+        # Distinct wording per call so the semantic answer cache does not short-circuit it
+        return f"question {next(counter)}: explain {synthetic.WORDS[next(counter) % len(synthetic.WORDS)]}"
+
+    for name, path in inputs.items():
+        if name.startswith("video_"):
+            filename = f"endpoint-{name}.mp4"
+            measure(results, f"endpoint.upload_video.cold.{name}", lambda: upload_video(path, filename))
+            measure(results, f"endpoint.upload_video.warm.{name}", lambda: upload_video(path, "renamed-" + filename))
+            measure(results, f"endpoint.ask.{name}", lambda: video_client.post(
+                "/ask", json={"question": unique_question(), "video_filename": filename}), runs * 5)
+            measure(results, f"endpoint.ask.repeat.{name}", lambda: video_client.post(
+                "/ask", json={"question": "what is this lecture about", "video_filename": filename}), runs * 5)
+        elif name.startswith("pdf_"):
+            filename = f"endpoint-{name}.pdf"
+            measure(results, f"endpoint.pdf_query.upload.{name}", lambda: upload_pdf(path, filename))
+            measure(results, f"endpoint.pdf_query.question.{name}", lambda: pdf_client.post(
+                "/pdf_query", data={"question": unique_question(), "pdf_name": filename}), runs * 5)
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nChange vs {baseline.get('commit')} (p50, lower is better):")
+    for name, stats in current["results"].items():
+        old = baseline["results"].get(name)
+        if old:
+            ratio = stats["p50_ms"] / old["p50_ms"] if old["p50_ms"] else float("inf")
+            print(f"{name:<45} {old['p50_ms']:10.1f} -> {stats['p50_ms']:10.1f} ms  ({ratio:5.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", default="groq=0,ollama=0,supabase=0",
+                        help="per-service fake latency in seconds, e.g. groq=0.2,ollama=0.5,supabase=0.02")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--videos", default="short,medium", help=f"any of {','.join(synthetic.VIDEO_SIZES)}")
+    parser.add_argument("--pdfs", default="small,medium", help=f"any of {','.join(synthetic.PDF_SIZES)}")
+    parser.add_argument("--skip", default="", help="comma-separated groups to skip: modules,endpoints")
+    parser.add_argument("--inputs", default=os.path.join(ROOT, "benchmarks", "inputs"), help="where synthetic inputs are cached")
+    parser.add_argument("--real-embeddings", action="store_true", help="use the SentenceTransformer instead of a hashing stand-in")
+    parser.add_argument("--output")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    latency = {k: float(v) for k, v in (item.split("=") for item in args.latency.split(",") if item)}
+    fake_services.configure(**latency)
+    server, base_url = fake_services.start()
+    scratch = tempfile.mkdtemp(prefix="insightai-bench-")
+    configure_environment(base_url, scratch)
+    os.chdir(ROOT)  # The Flask apps save uploads under relative static/ paths
+
+    # Importing settings registers the real factories, so the stand-in must be registered after it
+    import config.settings
+    from config.services import register
+    if not args.real_embeddings:
+        register("embedding_model", HashEmbedder, fork_safe=True)
+
+    inputs = synthetic.make_all(
+        args.inputs,
+        {k: v for k, v in synthetic.VIDEO_SIZES.items() if k in args.videos.split(",")},
+        {k: v for k, v in synthetic.PDF_SIZES.items() if k in args.pdfs.split(",")},
+    )
+
+    results = {}
+    skip = set(args.skip.split(","))
+    if "modules" not in skip:
+        module_benchmarks(results, inputs, args.runs)
+    if "endpoints" not in skip:
+        endpoint_benchmarks(results, inputs, args.runs)
+    server.shutdown()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "latency": latency,
+        "runs": args.runs,
+        "real_embeddings": args.real_embeddings,
+        "results": results,
+    }
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"{report['commit']}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Each probe runs in a fresh interpreter so nothing is already imported or cached
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+from config.services import warm_up
+if {eager}:
+    warm_up()
+elapsed = time.perf_counter() - start
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"seconds": elapsed, "peak_rss_mb": rss_kb / 1024}}))
+"""
+
+
+def measure(module, eager, runs):
+    results = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, eager=eager)],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        "seconds": min(r["seconds"] for r in results),
+        "peak_rss_mb": min(r["peak_rss_mb"] for r in results),
+    }
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    for module in ["app", "pdf", "modules.database"]:
+        # "eager" builds every service right after import, as importing config.settings used to
+        eager = measure(module, True, runs)
+        lazy = measure(module, False, runs)
+        print(f"{module:<18} eager {eager['seconds']:6.2f}s {eager['peak_rss_mb']:7.1f} MB   "
+              f"lazy {lazy['seconds']:6.2f}s {lazy['peak_rss_mb']:7.1f} MB")
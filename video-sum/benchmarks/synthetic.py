@@ -0,0 +1,55 @@
+import os
+import random
+import subprocess
+
+# Name -> duration in seconds / page count
+VIDEO_SIZES = {"short": 30, "medium": 180, "long": 900}
+PDF_SIZES = {"small": 5, "medium": 50, "large": 300}
+
+WORDS = (
+    "analysis approach method results data model system evaluation performance network "
+    "learning training feature vector matrix gradient optimization retrieval summary lecture"
+).split()
+
+
+def make_video(path, seconds):
+    """Writes a test-pattern video with a tone, changing scene every 10 s."""
+    if os.path.exists(path):
+        return path
+    subprocess.run([
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size=640x360:rate=10:duration={seconds}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+        "-vf", "hue=h=t*36",  # Slow colour drift so the scene and dedupe filters have work to do
+        "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-shortest", path,
+    ], check=True)
+    return path
+
+
+def make_pdf(path, pages, seed=0):
+    """Writes a PDF of pages pages of generated prose."""
+    if os.path.exists(path):
+        return path
+    import fitz
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page()
+        paragraphs = []
+        for _ in range(6):
+            sentences = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 16))).capitalize() + "." for _ in range(5)]
+            paragraphs.append(" ".join(sentences))
+        page.insert_textbox(fitz.Rect(50, 50, 550, 800), f"Section {page_num + 1}\n\n" + "\n\n".join(paragraphs), fontsize=9)
+    doc.save(path)
+    return path
+
+
+def make_all(folder, video_sizes=VIDEO_SIZES, pdf_sizes=PDF_SIZES):
+    """Creates (or reuses) every synthetic input; returns {name: path}."""
+    os.makedirs(folder, exist_ok=True)
+    inputs = {}
+    for name, seconds in video_sizes.items():
+        inputs[f"video_{name}"] = make_video(os.path.join(folder, f"video_{name}.mp4"), seconds)
+    for name, pages in pdf_sizes.items():
+        inputs[f"pdf_{name}"] = make_pdf(os.path.join(folder, f"pdf_{name}.pdf"), pages)
+    return inputs
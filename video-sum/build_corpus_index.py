@@ -0,0 +1,5 @@
+from modules.database import backfill_corpus_index
+
+# Builds the corpus-wide search index from documents ingested before it existed
+if __name__ == "__main__":
+    print(backfill_corpus_index())
@@ -0,0 +1,70 @@
+import os
+import threading
+
+# name -> (factory, fork_safe). Fork-unsafe services (HTTP clients with connection
+# pools) are dropped in forked children and rebuilt there on first use; fork-safe
+# ones (the embedding model) stay shared copy-on-write with the parent.
+_factories = {}
+_instances = {}
+_lock = threading.RLock()
+
+
+def register(name, factory, fork_safe=False):
+    """Declares how to build a process-wide service without building it yet."""
+    _factories[name] = (factory, fork_safe)
+
+
+def get_service(name):
+    """Returns the service, constructing it on first use in this process."""
+    instance = _instances.get(name)
+    if instance is None:
+        with _lock:
+            instance = _instances.get(name)
+            if instance is None:
+                instance = _factories[name][0]()
+                _instances[name] = instance
+    return instance
+
+
+def warm_up(*names):
+    """Builds the given services (all registered ones by default) ahead of traffic.
+
+    Call before forking workers so fork-safe services are loaded once and shared.
+    """
+    for name in names or list(_factories):
+        get_service(name)
+
+
+def is_loaded(name):
+    return name in _instances
+
+
+def _after_fork_in_child():
+    # The lock may have been held by another thread at fork time
+    global _lock
+    _lock = threading.RLock()
+    for name, (_, fork_safe) in _factories.items():
+        if not fork_safe:
+            _instances.pop(name, None)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+class LazyService:
+    """Stands in for a service object and builds it on first attribute access."""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_service(self._name), attr)
+
+    def __repr__(self):
+        state = "loaded" if is_loaded(self._name) else "not loaded"
+        return f"<LazyService {self._name} ({state})>"
+
+
+def lazy(name):
+    return LazyService(name)
@@ -1,7 +1,6 @@
 import os
 from dotenv import load_dotenv
-from supabase import create_client, Client
-from sentence_transformers import SentenceTransformer
+from config.services import register, lazy
 
 # Load environment variables
 load_dotenv()
@@ -10,7 +9,130 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
 # Embedding Model
-embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Heavy clients are built on first use (or by config.services.warm_up), not at import
+def _create_supabase():
+    from supabase import create_client
+    return create_client(SUPABASE_URL, SUPABASE_KEY)
+
+def _create_embedding_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+def _create_groq():
+    from groq import Groq
+    return Groq()
+
+def _create_embedder():
+    from config.services import get_service
+    from modules.embedding_service import EmbeddingBatcher, RemoteEmbedder
+    if EMBEDDING_SERVICE_URL:
+        return RemoteEmbedder(EMBEDDING_SERVICE_URL)
+    return EmbeddingBatcher(get_service("embedding_model"))
+
+register("supabase", _create_supabase)
+register("embedding_model", _create_embedding_model, fork_safe=True)
+register("groq", _create_groq)
+# Owns a batching thread, so each forked process builds its own around the shared model
+register("embedder", _create_embedder)
+
+supabase = lazy("supabase")
+embedding_model = lazy("embedding_model")
+groq_client = lazy("groq")
+embedder = lazy("embedder")
+
+# Services to build at server start, e.g. "embedding_model,supabase"
+WARM_UP_SERVICES = [name for name in os.getenv("WARM_UP_SERVICES", "").split(",") if name]
+
+# Embedding storage format: "float32", "float16" or "int8"
+EMBEDDING_CODEC = os.getenv("EMBEDDING_CODEC", "float32")
+# How binary embeddings are written to Supabase: "base64" (text column) or "bytea"
+EMBEDDING_TRANSPORT = os.getenv("EMBEDDING_TRANSPORT", "base64")
+
+# Bulk ingestion: chunks per encode() batch and rows per Supabase insert request
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+INSERT_PAGE_SIZE = int(os.getenv("INSERT_PAGE_SIZE", "200"))
+INSERT_MAX_RETRIES = int(os.getenv("INSERT_MAX_RETRIES", "3"))
+
+# Transcription: concurrent Whisper uploads and the chunk upload format ("flac", "ogg" or "wav")
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "4"))
+TRANSCRIBE_FORMAT = os.getenv("TRANSCRIBE_FORMAT", "flac")
+TRANSCRIBE_MAX_RETRIES = int(os.getenv("TRANSCRIBE_MAX_RETRIES", "5"))
+
+# Frame sampling: base rate, ffmpeg scene-change threshold (0 disables) and
+# the perceptual-hash distance under which consecutive frames count as duplicates (0 disables)
+FRAME_FPS = float(os.getenv("FRAME_FPS", "0.67"))
+FRAME_SCENE_THRESHOLD = float(os.getenv("FRAME_SCENE_THRESHOLD", "0"))
+FRAME_HASH_DISTANCE = int(os.getenv("FRAME_HASH_DISTANCE", "5"))
+
+# Vision: concurrent Ollama batches, seconds of transcript context around each batch,
+# and whether to drop sentences that neighbouring batch descriptions repeat at their boundary
+VISION_WORKERS = int(os.getenv("VISION_WORKERS", "4"))
+VISION_CONTEXT_SECONDS = float(os.getenv("VISION_CONTEXT_SECONDS", "15"))
+VISION_STITCH = os.getenv("VISION_STITCH", "true").lower() == "true"
+
+# Background jobs: SQLite queue location, number of concurrent worker processes, and
+# seconds a failed or cancelled job stays retryable before its upload and files are deleted
+JOBS_DB = os.getenv("JOBS_DB", os.path.join(os.path.dirname(__file__), "../static/jobs.db"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+
+# Per-job checkpoints (completed stage outputs) kept on disk until the job succeeds,
+# so a failed or interrupted job resumes where it stopped; its extracted media is
+# kept in the job's scratch directory for as long
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", os.path.join(os.path.dirname(__file__), "../static/checkpoints"))
+
+# Shared stamp files that tell each process when a document's vector index is stale
+INDEX_STAMP_DIR = os.getenv("INDEX_STAMP_DIR", os.path.join(os.path.dirname(__file__), "../static/index_stamps"))
+
+# Per-job scratch space: parent directory (system temp dir when unset) and whether
+# to prefer a RAM-backed tmpfs such as /dev/shm when one is available
+SCRATCH_DIR = os.getenv("SCRATCH_DIR")
+SCRATCH_IN_RAM = os.getenv("SCRATCH_IN_RAM", "false").lower() == "true"
+
+# PDF ingestion: extraction processes, pages per extraction task, and chunks embedded
+# and stored per batch while the rest of the document is still being read
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+PDF_STREAM_BATCH = int(os.getenv("PDF_STREAM_BATCH", "256"))
+
+# Hybrid retrieval: fuse BM25 and dense rankings with reciprocal-rank fusion, taking
+# this many candidates from each ranking, with RRF's rank damping constant k
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "50"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Corpus-wide search index: directory of memory-mapped shards, rows per full shard, and
+# how many smaller shards (one per ingested document) may pile up before they are merged
+CORPUS_INDEX_DIR = os.getenv("CORPUS_INDEX_DIR", os.path.join(os.path.dirname(__file__), "../static/corpus_index"))
+CORPUS_SHARD_ROWS = int(os.getenv("CORPUS_SHARD_ROWS", "200000"))
+CORPUS_MAX_SMALL_SHARDS = int(os.getenv("CORPUS_MAX_SMALL_SHARDS", "16"))
+
+# Content-addressed cache of stage outputs (transcripts, descriptions, summaries, embeddings)
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(os.path.dirname(__file__), "../static/cache"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+# Semantic answer cache: minimum question similarity for reuse, entry lifetime and capacity
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+
+# Hierarchical summarization: prompt size that fits in one call, target size of each
+# chunk group summarized in the map step, and parallel summary calls per level
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "6000"))
+SUMMARY_GROUP_TOKENS = int(os.getenv("SUMMARY_GROUP_TOKENS", "3000"))
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "4"))
+
+# Embedding service: requests arriving within EMBED_WINDOW_MS are encoded as one batch.
+# Set EMBEDDING_SERVICE_URL to use a sidecar (python embedding_server.py) instead of in-process.
+EMBEDDING_SERVICE_URL = os.getenv("EMBEDDING_SERVICE_URL")
+EMBEDDING_SERVICE_PORT = int(os.getenv("EMBEDDING_SERVICE_PORT", "8765"))
+EMBED_WINDOW_MS = float(os.getenv("EMBED_WINDOW_MS", "5"))
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "64"))
+EMBED_QUEUE_LIMIT = int(os.getenv("EMBED_QUEUE_LIMIT", "1024"))
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "10000"))
+
+# Per-process metric snapshots, merged by the /metrics endpoint of any process
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join(os.path.dirname(__file__), "../static/metrics"))
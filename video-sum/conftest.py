@@ -0,0 +1 @@
+# Lets pytest import the app's packages (config, modules) from tests/
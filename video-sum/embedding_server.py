@@ -0,0 +1,45 @@
+import base64
+import json
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+from config.settings import embedding_model, EMBEDDING_SERVICE_PORT
+from modules.embedding_service import EmbeddingBatcher, EmbeddingQueueFull
+
+batcher = EmbeddingBatcher(embedding_model)
+
+class EmbeddingHandler(BaseHTTPRequestHandler):
+    """POST /embed {"texts": [...]} -> base64 float32 matrix; GET /stats."""
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if self.path != "/embed":
+            return self._send(404, {"error": "Not found"})
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        try:
+            matrix = np.atleast_2d(batcher.encode(payload["texts"]))
+        except EmbeddingQueueFull as e:
+            return self._send(503, {"error": str(e)})
+        self._send(200, {
+            "shape": list(matrix.shape),
+            "embeddings": base64.b64encode(matrix.astype(np.float32).tobytes()).decode("ascii"),
+        })
+
+    def do_GET(self):
+        if self.path != "/stats":
+            return self._send(404, {"error": "Not found"})
+        self._send(200, batcher.stats())
+
+    def log_message(self, format, *args):
+        pass  # One line per request would swamp the console under load
+
+if __name__ == "__main__":
+    embedding_model.encode("warm up")
+    print(f"Embedding service listening on 127.0.0.1:{EMBEDDING_SERVICE_PORT}")
+    ThreadingHTTPServer(("127.0.0.1", EMBEDDING_SERVICE_PORT), EmbeddingHandler).serve_forever()
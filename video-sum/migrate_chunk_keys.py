@@ -0,0 +1,58 @@
+"""Prepares an existing database for the upserts that key rows by document.
+
+1. Run BEFORE_SQL in the Supabase SQL editor to add the new columns.
+2. Run this script to delete duplicate rows and number the existing chunks.
+3. Run AFTER_SQL to add the unique indexes the upserts rely on.
+"""
+import sys
+from config.settings import supabase
+from modules.database import dedupe_documents, key_chunks
+
+# (table, document column, text column) of tables with one row per chunk
+CHUNK_TABLES = [
+    ("audio_knowledge", "video_filename", "text_chunk"),
+    ("frame_knowledge", "video_filename", "text_chunk"),
+    ("pdf_chunks", "pdf_name", "chunk_text"),
+]
+# Columns BEFORE_SQL adds to each chunk table
+NEW_COLUMNS = {
+    "audio_knowledge": "chunk_index, start_time, end_time",
+    "frame_knowledge": "chunk_index",
+    "pdf_chunks": "chunk_index, page",
+}
+# (table, document column) of tables with one row per document
+DOCUMENT_TABLES = [
+    ("video_summaries", "video_filename"),
+    ("pdf_metadata", "pdf_name"),
+]
+
+BEFORE_SQL = """
+alter table audio_knowledge add column if not exists chunk_index integer;
+alter table frame_knowledge add column if not exists chunk_index integer;
+alter table pdf_chunks add column if not exists chunk_index integer;
+alter table pdf_chunks add column if not exists page integer;
+alter table audio_knowledge add column if not exists start_time real;
+alter table audio_knowledge add column if not exists end_time real;
+"""
+
+AFTER_SQL = """
+create unique index if not exists audio_knowledge_chunk_key on audio_knowledge (video_filename, chunk_index);
+create unique index if not exists frame_knowledge_chunk_key on frame_knowledge (video_filename, chunk_index);
+create unique index if not exists pdf_chunks_chunk_key on pdf_chunks (pdf_name, chunk_index);
+create unique index if not exists video_summaries_video_key on video_summaries (video_filename);
+create unique index if not exists pdf_metadata_pdf_key on pdf_metadata (pdf_name);
+"""
+
+if __name__ == "__main__":
+    try:
+        for table, columns in NEW_COLUMNS.items():
+            supabase.table(table).select(columns).limit(1).execute()
+    except Exception as e:
+        print(f"Missing columns ({e}). Run this first, then run the script again:\n{BEFORE_SQL}")
+        sys.exit(1)
+
+    for table, document_column, text_column in CHUNK_TABLES:
+        key_chunks(table, document_column, text_column)
+    for table, document_column in DOCUMENT_TABLES:
+        dedupe_documents(table, document_column)
+    print(f"Duplicates removed. Now add the unique indexes:\n{AFTER_SQL}")
@@ -0,0 +1,8 @@
+from modules.database import migrate_embeddings
+
+# Tables whose "embedding" column may still hold json.dumps(list) strings
+TABLES = ["audio_knowledge", "frame_knowledge", "video_summaries", "pdf_chunks"]
+
+if __name__ == "__main__":
+    for table in TABLES:
+        migrate_embeddings(table)
@@ -0,0 +1,69 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from config.settings import ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL, ANSWER_CACHE_MAX_ENTRIES
+from modules.vector_index import normalize, index_stamp
+
+# entry id -> (document key, normalized question embedding, answer, created at, document stamp),
+# ordered from least to most recently used
+_entries = OrderedDict()
+_by_document = {}
+_ids = itertools.count()
+_lock = threading.Lock()
+_counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+def _remove(entry_id, counter=None):
+    document = _entries.pop(entry_id)[0]
+    ids = _by_document[document]
+    ids.discard(entry_id)
+    if not ids:
+        del _by_document[document]
+    if counter:
+        _counters[counter] += 1
+
+def lookup(document, question_embedding, threshold=ANSWER_CACHE_THRESHOLD, ttl=ANSWER_CACHE_TTL):
+    """Returns a cached answer to a near-identical question about document, or None."""
+    query = normalize(question_embedding)[0]
+    stamp = index_stamp(document)
+    now = time.time()
+    with _lock:
+        best_id, best_score = None, threshold
+        for entry_id in list(_by_document.get(document, ())):
+            _, embedding, _, created, entry_stamp = _entries[entry_id]
+            if entry_stamp != stamp:
+                _remove(entry_id, "invalidations")  # Document was re-ingested since
+                continue
+            if now - created > ttl:
+                _remove(entry_id, "evictions")
+                continue
+            score = float(embedding @ query)
+            if score >= best_score:
+                best_id, best_score = entry_id, score
+
+        if best_id is None:
+            _counters["misses"] += 1
+            return None
+        _counters["hits"] += 1
+        _entries.move_to_end(best_id)
+        return _entries[best_id][2]
+
+def store(document, question_embedding, answer, max_entries=ANSWER_CACHE_MAX_ENTRIES):
+    """Caches answer for a question about document, evicting least recently used entries."""
+    embedding = normalize(question_embedding)[0]
+    with _lock:
+        entry_id = next(_ids)
+        _entries[entry_id] = (document, embedding, answer, time.time(), index_stamp(document))
+        _by_document.setdefault(document, set()).add(entry_id)
+        while len(_entries) > max_entries:
+            _remove(next(iter(_entries)), "evictions")
+
+def stats():
+    """Hit/miss counters and current size of this process's answer cache."""
+    with _lock:
+        lookups = _counters["hits"] + _counters["misses"]
+        return {
+            **_counters,
+            "entries": len(_entries),
+            "hit_rate": _counters["hits"] / lookups if lookups else 0.0,
+        }
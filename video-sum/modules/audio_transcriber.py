@@ -1,43 +1,236 @@
 import os
+import subprocess
+import tempfile
+import time
+import wave
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from pydub import AudioSegment
-from groq import Groq
-import shutil
+from groq import RateLimitError
+from config.settings import groq_client, TRANSCRIBE_WORKERS, TRANSCRIBE_FORMAT, TRANSCRIBE_MAX_RETRIES
+from modules.workspace import job_workspace
+from modules.stage_cache import cached, content_key
+from modules.metrics import propagate_context, log_event
 
-client = Groq()
+# Set GROQ_BASE_URL to point the client at a local stub transcription server
+client = groq_client
 
-def split_audio(audio_path, chunk_length_ms=60000):
-    """Splits audio into smaller chunks for better processing."""
-    audio = AudioSegment.from_wav(audio_path)
-    chunks = [audio[i:i+chunk_length_ms] for i in range(0, len(audio), chunk_length_ms)]
-    
-    chunk_paths = []
-    os.makedirs("static/audio_chunks", exist_ok=True)
-    
-    for idx, chunk in enumerate(chunks):
-        chunk_path = f"static/audio_chunks/chunk_{idx}.wav"
-        chunk.export(chunk_path, format="wav")
-        chunk_paths.append(chunk_path)
+WHISPER_MODEL = "whisper-large-v3-turbo"
+
+# pydub export arguments for each supported upload format
+EXPORT_OPTIONS = {
+    "wav": {"format": "wav"},
+    "flac": {"format": "flac"},
+    "ogg": {"format": "ogg", "codec": "libopus", "bitrate": "32k"},
+}
+
+class _PcmReader:
+    """Incrementally reads PCM frames from a WAV file, or from ffmpeg for other formats."""
+
+    def __init__(self, audio_path):
+        self._process = None
+        if audio_path.lower().endswith(".wav"):
+            self._wav = wave.open(audio_path, "rb")
+            self.channels = self._wav.getnchannels()
+            self.sample_width = self._wav.getsampwidth()
+            self.frame_rate = self._wav.getframerate()
+        else:
+            # Decode anything else to 16 kHz mono s16le, which is all Whisper needs
+            self._wav = None
+            self.channels, self.sample_width, self.frame_rate = 1, 2, 16000
+            # A file rather than a pipe, so a chatty ffmpeg can never block on stderr
+            self._errors = tempfile.TemporaryFile()
+            self._process = subprocess.Popen(
+                ["ffmpeg", "-loglevel", "error", "-i", audio_path, "-f", "s16le", "-ac", "1", "-ar", "16000", "-"],
+                stdout=subprocess.PIPE,
+                stderr=self._errors,
+            )
+
+    @property
+    def frame_size(self):
+        return self.channels * self.sample_width
+
+    def read(self, frames):
+        if self._wav is not None:
+            return self._wav.readframes(frames)
+        wanted = frames * self.frame_size
+        data = b""
+        while len(data) < wanted:
+            block = self._process.stdout.read(wanted - len(data))
+            if not block:
+                self._check_exit()
+                break
+            data += block
+        return data
+
+    def _check_exit(self):
+        """Raises if ffmpeg failed, instead of passing its truncated output off as the whole audio."""
+        if self._process.wait() != 0:
+            self._errors.seek(0)
+            message = self._errors.read().decode("utf-8", "replace").strip()
+            raise RuntimeError(f"ffmpeg could not decode the audio (exit {self._process.returncode}): {message}")
+
+    def close(self):
+        if self._wav is not None:
+            self._wav.close()
+        if self._process is not None:
+            self._process.stdout.close()
+            if self._process.poll() is None:
+                self._process.kill()  # Stopped early; the rest of the audio is not wanted
+            self._process.wait()
+            self._errors.close()
+
+def _quietest_frame(data, reader, search_frames, block_ms=20):
+    """Frame offset of the quietest short block within the last search_frames of data."""
+    dtypes = {1: np.uint8, 2: np.int16, 4: np.int32}
+    total_frames = len(data) // reader.frame_size
+    if reader.sample_width not in dtypes or search_frames <= 0:
+        return total_frames
+
+    search_start = max(0, total_frames - search_frames)
+    samples = np.frombuffer(data, dtype=dtypes[reader.sample_width], offset=search_start * reader.frame_size)
+    samples = samples.reshape(-1, reader.channels).astype(np.float32)
+    if reader.sample_width == 1:
+        samples -= 128.0
+
+    block = max(1, reader.frame_rate * block_ms // 1000)
+    blocks = len(samples) // block
+    if blocks == 0:
+        return total_frames
+    energy = np.square(samples[:blocks * block]).reshape(blocks, -1).mean(axis=1)
+    quietest = int(np.argmin(energy))
+    return search_start + quietest * block + block // 2
+
+def stream_audio_chunks(audio_path, chunk_length_ms=60000, silence_window_ms=5000):
+    """Yields (start_seconds, AudioSegment) chunks without decoding the whole file.
+
+    Each chunk ends at the quietest point of its last silence_window_ms so words
+    are not cut in half; only one chunk is held in memory at a time.
+    """
+    reader = _PcmReader(audio_path)
+    try:
+        chunk_frames = reader.frame_rate * chunk_length_ms // 1000
+        search_frames = reader.frame_rate * silence_window_ms // 1000
+        carry = b""
+        start_frame = 0
+        while True:
+            data = carry + reader.read(chunk_frames - len(carry) // reader.frame_size)
+            if not data:
+                break
+            if len(data) < chunk_frames * reader.frame_size:
+                cut = len(data) // reader.frame_size  # End of input: keep the remainder
+            else:
+                cut = _quietest_frame(data, reader, search_frames)
+            segment = AudioSegment(
+                data=data[:cut * reader.frame_size],
+                sample_width=reader.sample_width,
+                frame_rate=reader.frame_rate,
+                channels=reader.channels,
+            )
+            yield start_frame / reader.frame_rate, segment
+            carry = data[cut * reader.frame_size:]
+            start_frame += cut
+    finally:
+        reader.close()
+
+def split_audio(audio_path, chunk_dir, chunk_length_ms=60000, export_format=TRANSCRIBE_FORMAT):
+    """Splits audio into smaller chunks for better processing.
+
+    Lazily yields (chunk_path, start_seconds) pairs in playback order.
+    """
+    os.makedirs(chunk_dir, exist_ok=True)
     
-    return chunk_paths
+    for idx, (start, chunk) in enumerate(stream_audio_chunks(audio_path, chunk_length_ms)):
+        chunk_path = os.path.join(chunk_dir, f"chunk_{idx}.{export_format}")
+        chunk.export(chunk_path, **EXPORT_OPTIONS[export_format])
+        yield chunk_path, start
 
-def transcribe_audio(audio_path):
-    """Transcribes audio in chunks."""
-    print("Starting Transcription...")
-    chunk_paths = split_audio(audio_path)
-    full_transcription = ""
+def _retry_delay(error, attempt):
+    """Seconds to wait after a rate-limit error, honouring Retry-After when sent."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return min(2 ** attempt, 30)
 
-    for chunk in chunk_paths:
-        with open(chunk, "rb") as file:
+def _request_transcription(chunk_path, data, max_retries):
+    """Sends one chunk to Whisper; returns its text and chunk-relative segments."""
+    for attempt in range(max_retries + 1):
+        try:
             transcription = client.audio.transcriptions.create(
-                file=(chunk, file.read()),
-                model="whisper-large-v3-turbo",
+                file=(os.path.basename(chunk_path), data),
+                model=WHISPER_MODEL,
                 response_format="verbose_json",
             )
-            full_transcription += transcription.text + " "
+            break
+        except RateLimitError as e:
+            if attempt == max_retries:
+                raise
+            delay = _retry_delay(e, attempt)
+            log_event("transcription", chunk=os.path.basename(chunk_path), rate_limited=True, retry_in=round(delay, 1))
+            time.sleep(delay)
 
-    try:
-        shutil.rmtree(audio_path)
-        shutil.rmtree("static/audio_chunks")  # Recreate the empty directory
-    except Exception as e:
-        print(f"Error clearing directory static/audio_chunks: {e}")
-    return full_transcription.strip()
+    segments = [
+        {"start": segment["start"], "end": segment["end"], "text": segment["text"].strip()}
+        for segment in getattr(transcription, "segments", None) or []
+    ]
+    return transcription.text, segments
+
+def transcribe_chunk(chunk_path, offset, max_retries=TRANSCRIBE_MAX_RETRIES):
+    """Transcribes one chunk, shifting its segment timestamps by offset seconds."""
+    with open(chunk_path, "rb") as file:
+        data = file.read()
+
+    # Identical audio always yields an identical chunk file, so its bytes are the cache key
+    text, segments = cached(
+        "transcript",
+        content_key(WHISPER_MODEL, data),
+        lambda: _request_transcription(chunk_path, data, max_retries),
+    )
+    shifted = [
+        {"start": segment["start"] + offset, "end": segment["end"] + offset, "text": segment["text"]}
+        for segment in segments
+    ]
+    return text, shifted
+
+def transcribe_audio_segments(audio_path, work_dir=None, workers=TRANSCRIBE_WORKERS, checkpoints=None):
+    """Transcribes audio chunks concurrently.
+
+    Chunks are written under work_dir (a private temp dir when not given).
+    With checkpoints (a JobCheckpoints), each finished chunk is saved so a retried
+    job only sends the chunks it had not finished.
+    Returns the full text and the timestamped segments, both in playback order.
+    """
+    log_event("transcription", audio_path=audio_path, started=True)
+    with ExitStack() as stack:
+        if work_dir is None:
+            work_dir = stack.enter_context(job_workspace("transcribe-"))
+        chunk_paths = split_audio(audio_path, os.path.join(work_dir, "audio_chunks"))
+
+        def transcribe(numbered_chunk):
+            index, (chunk_path, offset) = numbered_chunk
+            if checkpoints is None:
+                return transcribe_chunk(chunk_path, offset)
+            return checkpoints.memo(f"transcript-{index}", lambda: transcribe_chunk(chunk_path, offset))
+
+        # Submit chunks as they are exported, keeping only a few ahead of the workers,
+        # so transcription starts with the first chunk rather than after the last
+        results, pending = [], deque()
+        workers = max(1, workers)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for numbered_chunk in enumerate(chunk_paths):
+                if len(pending) >= workers * 2:
+                    results.append(pending.popleft().result())
+                pending.append(pool.submit(propagate_context(transcribe), numbered_chunk))
+            results.extend(future.result() for future in pending)
+
+    full_transcription = " ".join(text.strip() for text, _ in results)
+    segments = [segment for _, chunk_segments in results for segment in chunk_segments]
+    return full_transcription.strip(), segments
+
+def transcribe_audio(audio_path, work_dir=None, workers=TRANSCRIBE_WORKERS):
+    """Transcribes audio in chunks."""
+    return transcribe_audio_segments(audio_path, work_dir, workers)[0]
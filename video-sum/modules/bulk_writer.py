@@ -0,0 +1,100 @@
+import time
+from config.settings import supabase, embedder, EMBEDDING_MODEL_NAME, EMBED_BATCH_SIZE, INSERT_PAGE_SIZE, INSERT_MAX_RETRIES
+from modules.embedding_codec import encode_embedding
+from modules.stage_cache import cached, content_key
+from modules.metrics import stage, log_event
+
+
+def encode_chunks(chunks, batch_size=EMBED_BATCH_SIZE):
+    """Embeds all chunks with a single batched encode call."""
+    chunks = list(chunks)
+    with stage("embedding") as recorder:
+        recorder.add(chunks=len(chunks))
+        return cached(
+            "embeddings",
+            content_key(EMBEDDING_MODEL_NAME, *chunks),
+            lambda: embedder.encode(chunks, batch_size=batch_size),
+        )
+
+
+def bulk_insert(table, rows, page_size=INSERT_PAGE_SIZE, max_retries=INSERT_MAX_RETRIES, on_conflict=None):
+    """Inserts rows in multi-row pages, retrying failed pages with backoff.
+
+    With on_conflict (comma-separated unique columns) rows are upserted, so
+    writing the same rows again is harmless.
+    """
+    with stage("db_write") as recorder:
+        recorder.add(
+            bytes=sum(len(value) for row in rows for value in row.values() if isinstance(value, str)),
+            rows=len(rows),
+        )
+        return _insert_pages(table, rows, page_size, max_retries, on_conflict)
+
+def _insert_pages(table, rows, page_size, max_retries, on_conflict=None):
+    start = time.perf_counter()
+    for i in range(0, len(rows), page_size):
+        page = rows[i:i + page_size]
+        for attempt in range(max_retries + 1):
+            try:
+                if on_conflict:
+                    supabase.table(table).upsert(page, on_conflict=on_conflict).execute()
+                else:
+                    supabase.table(table).insert(page).execute()
+                break
+            except Exception as e:
+                if attempt == max_retries:
+                    raise
+                log_event("db_write", table=table, page=i // page_size + 1, attempt=attempt + 1, error=str(e))
+                time.sleep(0.5 * 2 ** attempt)
+
+    elapsed = time.perf_counter() - start
+    rate = len(rows) / elapsed if elapsed else float("inf")
+    log_event("db_write", table=table, rows=len(rows), seconds=round(elapsed, 3), rows_per_second=round(rate) if elapsed else None)
+    return rate
+
+
+# Chunk rows are keyed by their document plus chunk_index under a unique index;
+# migrate_chunk_keys.py adds the columns and indexes to an existing database.
+def store_chunks(table, chunks, text_column, extra_fields, embeddings=None, first_index=0, delete_stale=True,
+                 chunk_fields=None):
+    """Embeds (unless embeddings are given) and upserts a document's text chunks.
+
+    extra_fields identify the document; chunk_fields, when given, holds one dict of
+    further columns per chunk (e.g. its page). Re-running for the same document replaces
+    its rows instead of duplicating them, so an interrupted ingestion can simply
+    be run again. A document written in batches passes each batch's first_index
+    and delete_stale=False, then calls delete_stale_chunks once at the end.
+    Returns the embeddings.
+    """
+    chunks = list(chunks)
+    if not chunks:
+        if delete_stale:
+            delete_stale_chunks(table, extra_fields, first_index)
+        return []
+    if embeddings is None:
+        embeddings = encode_chunks(chunks)
+    chunk_fields = chunk_fields or [{}] * len(chunks)
+    rows = [
+        {**extra_fields, **fields, "chunk_index": i, text_column: chunk, "embedding": encode_embedding(embedding)}
+        for i, (chunk, embedding, fields) in enumerate(zip(chunks, embeddings, chunk_fields), start=first_index)
+    ]
+    bulk_insert(table, rows, on_conflict=",".join([*extra_fields, "chunk_index"]))
+    if delete_stale:
+        delete_stale_chunks(table, extra_fields, first_index + len(rows))
+    return embeddings
+
+
+def delete_stale_chunks(table, extra_fields, count):
+    """Deletes a document's rows left over from an earlier, longer ingestion.
+
+    Rows without a chunk_index were written before chunks were keyed and are
+    always stale once the document has been stored again.
+    """
+    def document_rows():
+        query = supabase.table(table).delete()
+        for column, value in extra_fields.items():
+            query = query.eq(column, value)
+        return query
+
+    document_rows().gte("chunk_index", count).execute()
+    document_rows().is_("chunk_index", "null").execute()
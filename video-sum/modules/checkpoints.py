@@ -0,0 +1,67 @@
+import os
+import pickle
+import shutil
+import tempfile
+import uuid
+from config.settings import CHECKPOINT_DIR
+from modules.workspace import job_scratch_dir, scratch_root, JOB_SCRATCH_PREFIX
+
+_MISSING = object()
+
+
+class JobCheckpoints:
+    """Completed stage outputs of one job, persisted so a retried job can resume.
+
+    Values are pickled one file per name; work_dir holds files (extracted media)
+    that later stages read and that must survive a crash too. It lives in the job's
+    scratch directory, so SCRATCH_DIR and SCRATCH_IN_RAM apply to it.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.root = os.path.join(CHECKPOINT_DIR, job_id)
+
+    def _path(self, name):
+        return os.path.join(self.root, name + ".pkl")
+
+    @property
+    def work_dir(self):
+        return job_scratch_dir(self.job_id)
+
+    def get(self, name, default=None):
+        try:
+            with open(self._path(name), "rb") as f:
+                return pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return default
+
+    def put(self, name, value):
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(name)
+        # Write then rename so a crash never leaves a truncated checkpoint behind
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def memo(self, name, compute):
+        """Returns the checkpointed value for name, computing and saving it if missing."""
+        value = self.get(name, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(name, value)
+        return value
+
+    def clear(self):
+        """Deletes every checkpoint and work file of the job."""
+        shutil.rmtree(self.root, ignore_errors=True)
+        shutil.rmtree(job_scratch_dir(self.job_id, create=False), ignore_errors=True)
+
+
+def prune_checkpoints(keep_job_ids):
+    """Removes checkpoints and scratch directories of jobs that can no longer be resumed."""
+    job_ids = set(os.listdir(CHECKPOINT_DIR)) if os.path.isdir(CHECKPOINT_DIR) else set()
+    scratch = scratch_root() or tempfile.gettempdir()
+    job_ids.update(name[len(JOB_SCRATCH_PREFIX):] for name in os.listdir(scratch) if name.startswith(JOB_SCRATCH_PREFIX))
+    for job_id in job_ids - set(keep_job_ids):
+        JobCheckpoints(job_id).clear()
@@ -0,0 +1,337 @@
+import heapq
+import json
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+import numpy as np
+from config.settings import CORPUS_INDEX_DIR, CORPUS_SHARD_ROWS, CORPUS_MAX_SMALL_SHARDS
+from modules.vector_index import normalize
+
+try:
+    import fcntl  # Serialises writers across processes; unavailable on Windows
+except ImportError:
+    fcntl = None
+
+# Corpus-wide vector index over every ingested video and PDF.
+#
+# Rows live in immutable shards, each a directory of .npy arrays that queries
+# memory-map: vectors (float16, unit length), doc/kind/chunk columns and the
+# UTF-8 texts with their offsets. New documents are written as new small shards
+# and small shards are merged once there are too many. Re-ingesting a document
+# tombstones its old rows instead of rewriting their shards. manifest.json lists
+# the live shards, tombstones and named batches and is replaced atomically on
+# every change; shard directories it does not list are deleted after each write.
+
+KINDS = ["audio", "frame", "summary", "pdf_chunk", "pdf_summary"]
+_BLOCK_ROWS = 65536  # Rows converted to float32 at a time while scoring a shard
+
+_MANIFEST = "manifest.json"
+
+
+def _doc_key(source, document):
+    return f"{source}/{document}"
+
+
+class _Shard:
+    """Read-only, memory-mapped view of one shard directory."""
+
+    def __init__(self, shard_id):
+        path = os.path.join(CORPUS_INDEX_DIR, shard_id)
+        self.id = shard_id
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.doc = np.load(os.path.join(path, "doc.npy"), mmap_mode="r")
+        self.kind = np.load(os.path.join(path, "kind.npy"), mmap_mode="r")
+        self.chunk = np.load(os.path.join(path, "chunk.npy"), mmap_mode="r")
+        self.text_offsets = np.load(os.path.join(path, "text_offsets.npy"), mmap_mode="r")
+        self.text_data = np.memmap(os.path.join(path, "text.bin"), dtype=np.uint8, mode="r") \
+            if self.text_offsets[-1] else np.zeros(0, dtype=np.uint8)
+        with open(os.path.join(path, "documents.json")) as f:
+            self.documents = [tuple(doc) for doc in json.load(f)]
+
+    def __len__(self):
+        return len(self.doc)
+
+    def text(self, row):
+        start, end = self.text_offsets[row], self.text_offsets[row + 1]
+        return bytes(self.text_data[start:end]).decode("utf-8")
+
+    def row(self, i):
+        source, document = self.documents[self.doc[i]]
+        return {
+            "source": source,
+            "document": document,
+            "kind": KINDS[self.kind[i]],
+            "chunk_index": int(self.chunk[i]),
+            "text": self.text(i),
+        }
+
+
+def _write_shard(entries, vectors):
+    """Writes a new shard from row dicts and their embeddings; returns its ID."""
+    shard_id = f"shard-{uuid.uuid4().hex}"
+    tmp_path = os.path.join(CORPUS_INDEX_DIR, f".{shard_id}.tmp")
+    os.makedirs(tmp_path)
+
+    doc_ids = {}
+    for entry in entries:
+        doc_ids.setdefault((entry["source"], entry["document"]), len(doc_ids))
+    documents = [list(doc) for doc in doc_ids]
+
+    encoded = [entry["text"].encode("utf-8") for entry in entries]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(text) for text in encoded], out=offsets[1:])
+
+    np.save(os.path.join(tmp_path, "vectors.npy"), normalize(vectors).astype(np.float16))
+    np.save(os.path.join(tmp_path, "doc.npy"), np.array([doc_ids[(e["source"], e["document"])] for e in entries], dtype=np.int32))
+    np.save(os.path.join(tmp_path, "kind.npy"), np.array([KINDS.index(e["kind"]) for e in entries], dtype=np.int8))
+    np.save(os.path.join(tmp_path, "chunk.npy"), np.array([e.get("chunk_index", 0) for e in entries], dtype=np.int32))
+    np.save(os.path.join(tmp_path, "text_offsets.npy"), offsets)
+    with open(os.path.join(tmp_path, "text.bin"), "wb") as f:
+        for text in encoded:
+            f.write(text)
+    with open(os.path.join(tmp_path, "documents.json"), "w") as f:
+        json.dump(documents, f)
+
+    os.replace(tmp_path, os.path.join(CORPUS_INDEX_DIR, shard_id))
+    return shard_id, [_doc_key(*doc) for doc in documents]
+
+
+def _read_manifest():
+    try:
+        with open(os.path.join(CORPUS_INDEX_DIR, _MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"version": "", "shards": {}, "documents": {}, "tombstones": {}, "batches": {}}
+
+
+def _write_manifest(manifest):
+    manifest["version"] = uuid.uuid4().hex
+    path = os.path.join(CORPUS_INDEX_DIR, _MANIFEST)
+    tmp_path = f"{path}.{manifest['version']}"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+def _sweep(manifest):
+    """Deletes shard directories the manifest does not list: compacted-away shards,
+    and shards or temp dirs written by a writer that failed or was killed."""
+    for name in os.listdir(CORPUS_INDEX_DIR):
+        shard_id = name[1:-len(".tmp")] if name.startswith(".shard-") and name.endswith(".tmp") else name
+        if shard_id.startswith("shard-") and (name != shard_id or shard_id not in manifest["shards"]):
+            shutil.rmtree(os.path.join(CORPUS_INDEX_DIR, name), ignore_errors=True)
+
+
+@contextmanager
+def _writer():
+    """Yields the manifest to modify under an exclusive lock, then publishes it."""
+    os.makedirs(CORPUS_INDEX_DIR, exist_ok=True)
+    with open(os.path.join(CORPUS_INDEX_DIR, "write.lock"), "w") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        manifest = _read_manifest()
+        manifest.setdefault("batches", {})
+        try:
+            yield manifest
+            _write_manifest(manifest)
+        except BaseException:
+            _sweep(_read_manifest())  # Whatever the failed body wrote was never published
+            raise
+        _sweep(manifest)
+
+
+def _tombstone(manifest, key):
+    """Hides every existing row of a document and forgets its named batches."""
+    manifest["batches"].pop(key, None)
+    for shard_id in manifest["documents"].pop(key, []):
+        tombstones = manifest["tombstones"].setdefault(shard_id, [])
+        if key not in tombstones:
+            tombstones.append(key)
+
+
+def _publish_shard(manifest, entries, vectors):
+    shard_id, keys = _write_shard(entries, vectors)
+    manifest["shards"][shard_id] = len(entries)
+    for key in keys:
+        manifest["documents"].setdefault(key, []).append(shard_id)
+
+
+def add_rows(entries, embeddings, batch=None):
+    """Appends rows without replacing anything; entries are dicts with
+    source, document, kind, chunk_index and text.
+
+    With batch (a name unique within one document, whose rows all entries must
+    be), a batch already added since the document was last replaced or removed is
+    skipped, so a retried job can add its batches again without duplicating them.
+    """
+    entries = list(entries)
+    if not entries:
+        return
+    with _writer() as manifest:
+        if batch is not None:
+            batches = manifest["batches"].setdefault(_doc_key(entries[0]["source"], entries[0]["document"]), [])
+            if batch in batches:
+                return
+            batches.append(batch)
+        _publish_shard(manifest, entries, embeddings)
+        _maybe_compact(manifest)
+
+
+def add_document(source, document, entries, embeddings):
+    """Replaces every indexed row of one document with entries (see add_rows)."""
+    entries = list(entries)
+    with _writer() as manifest:
+        _tombstone(manifest, _doc_key(source, document))
+        if entries:
+            _publish_shard(manifest, entries, embeddings)
+        _maybe_compact(manifest)
+
+
+def remove_document(source, document):
+    with _writer() as manifest:
+        _tombstone(manifest, _doc_key(source, document))
+
+
+def _maybe_compact(manifest):
+    small = [shard_id for shard_id, rows in manifest["shards"].items() if rows < CORPUS_SHARD_ROWS]
+    if len(small) > CORPUS_MAX_SMALL_SHARDS:
+        _compact(manifest, small)
+
+
+def _compact(manifest, shard_ids):
+    """Merges shards into as few shards of up to CORPUS_SHARD_ROWS rows as possible, dropping dead rows."""
+    pending_entries, pending_vectors, pending_rows = [], [], 0
+
+    def flush():
+        nonlocal pending_entries, pending_vectors, pending_rows
+        if pending_entries:
+            _publish_shard(manifest, pending_entries, np.vstack(pending_vectors))
+        pending_entries, pending_vectors, pending_rows = [], [], 0
+
+    for shard_id in shard_ids:
+        shard = _Shard(shard_id)
+        dead = set(manifest["tombstones"].get(shard_id, []))
+        live = [i for i in range(len(shard)) if _doc_key(*shard.documents[shard.doc[i]]) not in dead]
+        if live:
+            pending_entries.extend(shard.row(i) for i in live)
+            pending_vectors.append(np.asarray(shard.vectors[live], dtype=np.float32))
+            pending_rows += len(live)
+        for key in {_doc_key(*doc) for doc in shard.documents}:
+            if key in manifest["documents"]:
+                manifest["documents"][key] = [s for s in manifest["documents"][key] if s != shard_id]
+                if not manifest["documents"][key]:
+                    del manifest["documents"][key]
+        del manifest["shards"][shard_id]
+        manifest["tombstones"].pop(shard_id, None)
+        if pending_rows >= CORPUS_SHARD_ROWS:
+            flush()
+    flush()
+    # _writer deletes the merged shards once the new manifest is published; readers
+    # still holding the old manifest reload when a shard goes missing
+
+
+def compact():
+    """Merges every small shard now, e.g. after a bulk backfill."""
+    with _writer() as manifest:
+        small = [shard_id for shard_id, rows in manifest["shards"].items() if rows < CORPUS_SHARD_ROWS]
+        if len(small) > 1:
+            _compact(manifest, small)
+
+
+def clear():
+    """Deletes the whole corpus index."""
+    with _writer() as manifest:
+        manifest.update(shards={}, documents={}, tombstones={}, batches={})
+
+
+_loaded = {"version": None, "shards": [], "tombstones": {}}
+_load_lock = threading.Lock()
+
+
+def _current_shards(force=False):
+    """Opened shards of the latest manifest, reusing the ones already mapped."""
+    manifest = _read_manifest()
+    with _load_lock:
+        if force or manifest["version"] != _loaded["version"]:
+            opened = {shard.id: shard for shard in _loaded["shards"]}
+            _loaded["shards"] = [opened.get(shard_id) or _Shard(shard_id) for shard_id in manifest["shards"]]
+            _loaded["tombstones"] = manifest["tombstones"]
+            _loaded["version"] = manifest["version"]
+        return _loaded["shards"], _loaded["tombstones"]
+
+
+def _shard_mask(shard, dead, sources, documents, kinds):
+    """Boolean mask of the shard's rows that pass the filters, or None when all do."""
+    allowed = [
+        doc_id for doc_id, (source, document) in enumerate(shard.documents)
+        if _doc_key(source, document) not in dead
+        and (sources is None or source in sources)
+        and (documents is None or document in documents)
+    ]
+    if len(allowed) == len(shard.documents) and kinds is None:
+        return None
+    mask = np.isin(shard.doc, allowed)
+    if kinds is not None:
+        mask &= np.isin(shard.kind, [KINDS.index(kind) for kind in kinds if kind in KINDS])
+    return mask
+
+
+def search(query_embedding, top_k=10, sources=None, documents=None, kinds=None):
+    """Returns the top_k rows most similar to the query across the whole corpus.
+
+    sources ("video"/"pdf"), documents (names) and kinds (see KINDS) restrict
+    which rows are considered. Each result is a row dict plus its score.
+    """
+    try:
+        return _search(query_embedding, top_k, sources, documents, kinds)
+    except FileNotFoundError:
+        # A shard was compacted away after we read the manifest
+        _current_shards(force=True)
+        return _search(query_embedding, top_k, sources, documents, kinds)
+
+
+def _search(query_embedding, top_k, sources, documents, kinds):
+    if top_k <= 0:
+        return []
+    sources = set(sources) if sources is not None else None
+    documents = set(documents) if documents is not None else None
+    query = normalize(query_embedding)[0]
+    shards, tombstones = _current_shards()
+
+    best = []  # Min-heap of (score, shard number, row)
+    for n, shard in enumerate(shards):
+        if not len(shard) or shard.vectors.shape[1] != len(query):
+            continue
+        mask = _shard_mask(shard, set(tombstones.get(shard.id, [])), sources, documents, kinds)
+        if mask is not None and not mask.any():
+            continue
+        scores = np.empty(len(shard), dtype=np.float32)
+        for start in range(0, len(shard), _BLOCK_ROWS):
+            block = np.asarray(shard.vectors[start:start + _BLOCK_ROWS], dtype=np.float32)
+            scores[start:start + len(block)] = block @ query
+        if mask is not None:
+            scores[~mask] = -np.inf
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        for i in top:
+            if scores[i] == -np.inf:
+                continue
+            item = (float(scores[i]), n, int(i))
+            if len(best) < top_k:
+                heapq.heappush(best, item)
+            elif item > best[0]:
+                heapq.heapreplace(best, item)
+
+    return [{**shards[n].row(i), "score": score} for score, n, i in sorted(best, reverse=True)]
+
+
+def stats():
+    manifest = _read_manifest()
+    return {
+        "shards": len(manifest["shards"]),
+        "rows": sum(manifest["shards"].values()),
+        "documents": len(manifest["documents"]),
+        "tombstoned_shards": len(manifest["tombstones"]),
+    }
@@ -1,3 +1,87 @@
+import re
+from bisect import bisect_right
+from collections import namedtuple
+
+# start/end are character offsets into the source text; page is set for PDFs and
+# start_time/end_time (seconds) for transcripts built from timestamped segments
+Chunk = namedtuple("Chunk", "text start end page start_time end_time", defaults=(None, None, None))
+
+SENTENCE_BREAKS = (". ", "? ", "! ", "\n")
+_WORD = re.compile(r"\S+")
+
+
+def _split_point(text, start, end, sentence_aware, after=0):
+    """Best place to end a chunk that must finish before end and extend past after."""
+    if sentence_aware:
+        # A break at or before after would end this chunk inside the previous one
+        low = max(start + 1, after)
+        best = max(text.rfind(mark, low, end) for mark in SENTENCE_BREAKS)
+        if best >= low:
+            return best + 1  # Keep the punctuation with its sentence
+    return end  # Force split if no good sentence break is found
+
+
+def _char_spans(text, max_chunk_size, overlap, sentence_aware):
+    n = len(text)
+    start = previous_end = 0
+    while start < n:
+        while start < n and text[start].isspace():
+            start += 1
+        if start >= n:
+            return
+        if n - start <= max_chunk_size:
+            yield start, n
+            return
+        end = _split_point(text, start, start + max_chunk_size, sentence_aware, previous_end)
+        yield start, end
+        previous_end = end
+        if overlap and end - start > overlap:
+            # Step back for overlap, starting on a word boundary after this chunk's start
+            back_from = max(end - overlap, start + 1)
+            back = text.find(" ", back_from, end)
+            start = back if back != -1 else back_from
+        else:
+            start = end  # Too short to overlap without re-reading most of it
+
+
+def _token_spans(text, max_tokens, overlap, sentence_aware):
+    words = [(m.start(), m.end()) for m in _WORD.finditer(text)]
+    i = previous_j = 0
+    while i < len(words):
+        j = min(i + max_tokens, len(words))
+        if j < len(words) and sentence_aware:
+            # Prefer to end on a word that closes a sentence, past the end of the previous chunk
+            for k in range(j - 1, max(i, previous_j - 1), -1):
+                if text[words[k][1] - 1] in ".?!":
+                    j = k + 1
+                    break
+        yield words[i][0], words[j - 1][1]
+        if j >= len(words):
+            return
+        previous_j = j
+        i = j - overlap if overlap and j - i > overlap else j
+
+
+def iter_chunks(text, max_chunk_size=500, overlap=0, unit="chars", sentence_aware=True, page=None):
+    """Lazily yields Chunks of text in a single linear pass.
+
+    max_chunk_size and overlap are counted in characters, or in whitespace-separated
+    tokens when unit="tokens".
+    """
+    if unit == "tokens":
+        spans = _token_spans(text, max_chunk_size, overlap, sentence_aware)
+    elif unit == "chars":
+        spans = _char_spans(text, max_chunk_size, overlap, sentence_aware)
+    else:
+        raise ValueError(f"Unknown chunk size unit: {unit}")
+
+    for start, end in spans:
+        # Trim trailing whitespace without copying the rest of the text
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if end > start:
+            yield Chunk(text[start:end], start, end, page)
+
 
 def chunk_text(text, max_chunk_size=500):
     """
@@ -6,13 +90,32 @@ def chunk_text(text, max_chunk_size=500):
     if not isinstance(text, str) or not text.strip():
         raise ValueError("Invalid text input: Must be a non-empty string")
 
-    chunks = []
-    while len(text) > max_chunk_size:
-        split_point = text.rfind(". ", 0, max_chunk_size)
-        if split_point == -1:
-            split_point = max_chunk_size  # Force split if no good sentence break is found
-        chunks.append(text[:split_point + 1].strip())
-        text = text[split_point + 1:].strip()
+    return [chunk.text for chunk in iter_chunks(text, max_chunk_size)]
+
+
+def chunk_pages(page_texts, max_chunk_size=1000, overlap=200, **options):
+    """Yields Chunks for {page_num: text}, tagged with their page number.
+
+    page_texts may also be any iterable of (page_num, text) pairs, consumed lazily.
+    """
+    items = page_texts.items() if isinstance(page_texts, dict) else page_texts
+    for page_num, page_text in items:
+        yield from iter_chunks(page_text, max_chunk_size, overlap, page=page_num, **options)
+
+
+def chunk_segments(segments, max_chunk_size=500, overlap=0, **options):
+    """Yields Chunks of a timestamped transcript with the time span each one covers.
+
+    segments are {"start", "end", "text"} dicts in playback order.
+    """
+    parts, starts, offset = [], [], 0
+    for segment in segments:
+        starts.append(offset)
+        parts.append(segment["text"])
+        offset += len(segment["text"]) + 1
+    text = " ".join(parts)
 
-    chunks.append(text.strip())  # Add remaining text
-    return chunks
\ No newline at end of file
+    for chunk in iter_chunks(text, max_chunk_size, overlap, **options):
+        first = segments[bisect_right(starts, chunk.start) - 1]
+        last = segments[bisect_right(starts, chunk.end - 1) - 1]
+        yield chunk._replace(start_time=first["start"], end_time=last["end"])
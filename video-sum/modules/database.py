@@ -1,66 +1,194 @@
-import json
-from config.settings import supabase, embedding_model
-import numpy as np
-from modules.data_chunk import chunk_text
-# text_utils.py
+import hashlib
+from config.settings import supabase, embedder
+from modules.data_chunk import chunk_text, chunk_segments
+from modules.vector_index import get_index, drop_index
+from modules import corpus_index
+from modules.bulk_writer import store_chunks
+from modules.metrics import stage
+from modules.embedding_codec import encode_embedding, decode_embeddings, is_legacy
 
 def store_summary(video_filename, summary):
-    """Store summary with embeddings in Supabase."""
-    embedding = embedding_model.encode(summary).tolist()
-    supabase.table("video_summaries").insert({
+    """Store summary with embeddings in Supabase (one row per video, needs a unique video_filename)."""
+    embedding = embedder.encode(summary)
+    supabase.table("video_summaries").upsert({
         "video_filename": video_filename,
         "summary": summary,
-        "embedding": json.dumps(embedding)
-    }).execute()
-
-def store_knowledge(video_filename, transcription, frame_data, summary):
-    """Store transcriptions & frames separately in Supabase."""
-    text_chunks = chunk_text(transcription)
-    for chunk in text_chunks:
-        embedding = embedding_model.encode(chunk).tolist()
-        supabase.table("audio_knowledge").insert({
-            "video_filename": video_filename,
-            "text_chunk": chunk,
-            "embedding": json.dumps(embedding)
-        }).execute()
-
-    frame_chunks = chunk_text(frame_data)
-    for chunk in frame_chunks:
-        embedding = embedding_model.encode(chunk).tolist()
-        supabase.table("frame_knowledge").insert({
-            "video_filename": video_filename,
-            "text_chunk": chunk,
-            "embedding": json.dumps(embedding)
-        }).execute()
-
-    store_summary(video_filename, summary)
+        "embedding": encode_embedding(embedding)
+    }, on_conflict="video_filename").execute()
+    return embedding
+
+def _audio_chunks(transcription, segments):
+    """Audio chunks and their time spans, from the timestamped segments when there are any."""
+    timed = list(chunk_segments(segments)) if segments else []
+    if not timed:
+        chunks = chunk_text(transcription)
+        return chunks, [{"start_time": None, "end_time": None}] * len(chunks)
+    return [chunk.text for chunk in timed], [
+        {"start_time": chunk.start_time, "end_time": chunk.end_time} for chunk in timed
+    ]
+
+def store_knowledge(video_filename, transcription, frame_data, summary, segments=None):
+    """Store transcriptions & frames separately in Supabase.
+
+    With segments (Whisper's timestamped segments) each audio chunk also stores the
+    start_time and end_time it covers. Every write is an upsert, so running this
+    again after a failure is safe.
+    """
+    audio_chunks, audio_times = _audio_chunks(transcription, segments)
+    entries, embeddings = [], []
+    for table, kind, chunks, chunk_fields in [
+        ("audio_knowledge", "audio", audio_chunks, audio_times),
+        ("frame_knowledge", "frame", chunk_text(frame_data), None),
+    ]:
+        embeddings.extend(store_chunks(table, chunks, "text_chunk", {"video_filename": video_filename},
+                                       chunk_fields=chunk_fields))
+        entries.extend({"kind": kind, "chunk_index": i, "text": chunk} for i, chunk in enumerate(chunks))
+    # Rows were replaced rather than appended, so every process rebuilds its index
+    drop_index(("video", video_filename))
+
+    embeddings.append(store_summary(video_filename, summary))
+    entries.append({"kind": "summary", "chunk_index": 0, "text": summary})
+    corpus_index.add_document("video", video_filename, [
+        {**entry, "source": "video", "document": video_filename} for entry in entries
+    ], embeddings)
+
+def _clock(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+def _cited(record):
+    """An audio chunk's text prefixed with the time span it covers, e.g. "[01:05-01:42] ..."."""
+    if record.get("start_time") is None:
+        return record["text_chunk"]
+    return f"[{_clock(record['start_time'])}-{_clock(record['end_time'])}] {record['text_chunk']}"
+
+def load_video_embeddings(video_filename):
+    """Reads every audio & frame chunk of a video from Supabase for indexing.
+
+    Audio chunks carry their time span so answers can cite where in the video they come from.
+    """
+    embeddings, texts = [], []
+    for table, columns in [("audio_knowledge", "text_chunk, embedding, start_time, end_time"),
+                           ("frame_knowledge", "text_chunk, embedding")]:
+        response = supabase.table(table).select(columns).eq("video_filename", video_filename).execute()
+        for record in response.data or []:
+            embeddings.append(record["embedding"])
+            texts.append(_cited(record))
+    return decode_embeddings(embeddings), texts
 
 # 🔹 Retrieve Most Relevant Chunks (Efficient Querying)
-def fetch_relevant_chunks(video_filename, question, top_n=5):
+def fetch_relevant_chunks(video_filename, question, top_n=5, question_embedding=None):
     """
     Fetches the most relevant text chunks from audio & frame data using vector similarity.
     """
-    question_embedding = embedding_model.encode(question).tolist()
-    table_names = ["audio_knowledge", "frame_knowledge"]
-
-    all_chunks = []
-    for table in table_names:
-        response = supabase.table(table).select("*").eq("video_filename", video_filename).execute()
-        records = response.data or []
-
-        for record in records:
-            stored_embedding = np.array(json.loads(record["embedding"]))
-            similarity = np.dot(question_embedding, stored_embedding) / (
-                np.linalg.norm(question_embedding) * np.linalg.norm(stored_embedding)
-            )
-            all_chunks.append((similarity, record["text_chunk"]))
-
-    # Sort by highest similarity and return top chunks
-    all_chunks.sort(reverse=True, key=lambda x: x[0])
-    top_chunks = [chunk for _, chunk in all_chunks[:top_n]]
-    print("done")
+    with stage("retrieval") as recorder:
+        index = get_index(("video", video_filename), lambda: load_video_embeddings(video_filename))
+        if question_embedding is None:
+            question_embedding = embedder.encode(question)
+        top_chunks = index.query(question, question_embedding, top_n)
+        recorder.add(chunks=len(index))
 
     return "\n".join(top_chunks)
 
 def fetch_summary(video_filename):
-    return supabase.table("video_summaries").select("summary").eq("video_filename", video_filename).execute()
\ No newline at end of file
+    return supabase.table("video_summaries").select("summary").eq("video_filename", video_filename).execute()
+
+def migrate_embeddings(table, page_size=500):
+    """Rewrites legacy JSON-list embeddings in a table with the configured codec."""
+    migrated = 0
+    start = 0
+    while True:
+        rows = supabase.table(table).select("id, embedding").order("id").range(start, start + page_size - 1).execute().data or []
+        for row in rows:
+            if is_legacy(row["embedding"]):
+                embedding = decode_embeddings([row["embedding"]])[0]
+                supabase.table(table).update({"embedding": encode_embedding(embedding)}).eq("id", row["id"]).execute()
+                migrated += 1
+        if len(rows) < page_size:
+            break
+        start += page_size
+    print(f"Migrated {migrated} embeddings in {table}")
+    return migrated
+
+def _read_all(table, columns, page_size):
+    rows, start = [], 0
+    while True:
+        page = supabase.table(table).select(columns).order("id").range(start, start + page_size - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        start += page_size
+
+def _delete_ids(table, ids, page_size=200):
+    for i in range(0, len(ids), page_size):
+        supabase.table(table).delete().in_("id", ids[i:i + page_size]).execute()
+
+def dedupe_documents(table, document_column, page_size=1000):
+    """Keeps only the newest row of each document in a one-row-per-document table."""
+    rows = _read_all(table, f"id, {document_column}", page_size)
+    # Rows come in id order, so the last one per document wins
+    keep = set({row[document_column]: row["id"] for row in rows}.values())
+    stale = [row["id"] for row in rows if row["id"] not in keep]
+    _delete_ids(table, stale)
+    print(f"Deleted {len(stale)} duplicate rows from {table}")
+    return len(stale)
+
+def key_chunks(table, document_column, text_column, page_size=1000):
+    """Deletes duplicate chunk rows and numbers the rest, ready for the unique chunk_index key.
+
+    A document that was already stored with chunk_index loses its unnumbered rows
+    (leftovers of an older ingestion) and all but the newest row per index. Any
+    other document keeps the first copy of each distinct chunk text, numbered in
+    id order; repeated uploads used to append a full second copy.
+    """
+    documents = {}
+    for row in _read_all(table, f"id, {document_column}, {text_column}, chunk_index", page_size):
+        documents.setdefault(row[document_column], []).append(row)
+
+    stale, renumbered = [], 0
+    for rows in documents.values():
+        if any(row["chunk_index"] is not None for row in rows):
+            newest = {row["chunk_index"]: row["id"] for row in rows if row["chunk_index"] is not None}
+            stale.extend(row["id"] for row in rows if newest.get(row["chunk_index"]) != row["id"])
+            continue
+        seen = set()
+        for row in rows:
+            text_hash = hashlib.sha1(row[text_column].encode("utf-8")).digest()
+            if text_hash in seen:
+                stale.append(row["id"])
+                continue
+            supabase.table(table).update({"chunk_index": len(seen)}).eq("id", row["id"]).execute()
+            seen.add(text_hash)
+            renumbered += 1
+    _delete_ids(table, stale)
+    print(f"Deleted {len(stale)} duplicate rows from {table} and numbered {renumbered} chunks")
+    return len(stale), renumbered
+
+# Tables holding embedded text, as (table, document column, text column, source, kind)
+CORPUS_TABLES = [
+    ("audio_knowledge", "video_filename", "text_chunk", "video", "audio"),
+    ("frame_knowledge", "video_filename", "text_chunk", "video", "frame"),
+    ("video_summaries", "video_filename", "summary", "video", "summary"),
+    ("pdf_chunks", "pdf_name", "chunk_text", "pdf", "pdf_chunk"),
+]
+
+def backfill_corpus_index(page_size=1000):
+    """Rebuilds the corpus-wide search index from every stored embedding."""
+    corpus_index.clear()
+    for table, document_column, text_column, source, kind in CORPUS_TABLES:
+        columns = f"id, {document_column}, {text_column}, embedding" + (", chunk_index" if table != "video_summaries" else "")
+        start = 0
+        while True:
+            rows = supabase.table(table).select(columns).order("id").range(start, start + page_size - 1).execute().data or []
+            corpus_index.add_rows([
+                {"source": source, "document": row[document_column], "kind": kind,
+                 "chunk_index": row.get("chunk_index") or 0, "text": row[text_column]}
+                for row in rows
+            ], decode_embeddings([row["embedding"] for row in rows]))
+            if len(rows) < page_size:
+                break
+            start += page_size
+        print(f"Indexed {table} for corpus search")
+    corpus_index.compact()
+    return corpus_index.stats()
@@ -0,0 +1,73 @@
+import base64
+import json
+import numpy as np
+from config.settings import EMBEDDING_CODEC, EMBEDDING_TRANSPORT
+
+# One header byte tags the payload so rows written with different codecs can coexist
+_TAGS = {"float32": 1, "float16": 2, "int8": 3}
+_CODECS = {tag: name for name, tag in _TAGS.items()}
+
+
+def encode_embedding(embedding, codec=EMBEDDING_CODEC, transport=EMBEDDING_TRANSPORT):
+    """Packs an embedding into a compact string for a Supabase row."""
+    if codec not in _TAGS:
+        raise ValueError(f"Unknown embedding codec: {codec}")
+    vector = np.asarray(embedding, dtype=np.float32).ravel()
+
+    if codec == "float32":
+        body = vector.tobytes()
+    elif codec == "float16":
+        body = vector.astype(np.float16).tobytes()
+    else:
+        # Symmetric int8 quantization with the per-vector scale stored up front
+        peak = float(np.abs(vector).max()) if vector.size else 0.0
+        scale = peak / 127.0 if peak else 1.0
+        quantized = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+        body = np.float32(scale).tobytes() + quantized.tobytes()
+
+    payload = bytes([_TAGS[codec]]) + body
+    if transport == "bytea":
+        return "\\x" + payload.hex()
+    if transport == "base64":
+        return base64.b64encode(payload).decode("ascii")
+    raise ValueError(f"Unknown embedding transport: {transport}")
+
+
+def decode_embedding(value):
+    """Unpacks a stored embedding into a float32 NumPy vector.
+
+    Legacy rows holding json.dumps(list) are still understood.
+    """
+    if isinstance(value, (list, tuple)):
+        return np.asarray(value, dtype=np.float32)
+    if isinstance(value, str):
+        if value.startswith("["):
+            return np.asarray(json.loads(value), dtype=np.float32)
+        if value.startswith("\\x"):
+            payload = bytes.fromhex(value[2:])
+        else:
+            payload = base64.b64decode(value)
+    else:
+        payload = bytes(value)
+
+    codec = _CODECS.get(payload[0])
+    if codec == "float32":
+        return np.frombuffer(payload, dtype=np.float32, offset=1)
+    if codec == "float16":
+        return np.frombuffer(payload, dtype=np.float16, offset=1).astype(np.float32)
+    if codec == "int8":
+        scale = np.frombuffer(payload, dtype=np.float32, count=1, offset=1)[0]
+        return np.frombuffer(payload, dtype=np.int8, offset=5).astype(np.float32) * scale
+    raise ValueError(f"Unknown embedding payload tag: {payload[0]}")
+
+
+def decode_embeddings(values):
+    """Decodes many stored embeddings into one float32 matrix."""
+    if not values:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.vstack([decode_embedding(value) for value in values])
+
+
+def is_legacy(value):
+    """True for embeddings still stored as a JSON list."""
+    return isinstance(value, str) and value.startswith("[")
@@ -0,0 +1,175 @@
+import base64
+import json
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+import numpy as np
+from config.settings import (
+    EMBED_WINDOW_MS, EMBED_MAX_BATCH, EMBED_QUEUE_LIMIT, EMBED_CACHE_SIZE, EMBEDDING_SERVICE_URL,
+)
+
+class EmbeddingQueueFull(Exception):
+    """Raised when too many texts are already waiting to be embedded."""
+
+class EmbeddingBatcher:
+    """Collects encode requests from many threads and runs them as shared batches.
+
+    encode() mirrors SentenceTransformer.encode for str and list inputs.
+    """
+
+    def __init__(self, model, window_ms=EMBED_WINDOW_MS, max_batch=EMBED_MAX_BATCH,
+                 queue_limit=EMBED_QUEUE_LIMIT, cache_size=EMBED_CACHE_SIZE):
+        self.model = model
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.cache_size = cache_size
+        self._queue = queue.Queue(maxsize=queue_limit)
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._latencies = deque(maxlen=10000)
+        self._counters = {"texts": 0, "batches": 0, "cache_hits": 0, "rejected": 0}
+        self._counters_lock = threading.Lock()
+        self._started = time.time()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _cached(self, text):
+        with self._cache_lock:
+            vector = self._cache.get(text)
+            if vector is not None:
+                self._cache.move_to_end(text)
+            return vector
+
+    def _count(self, name, amount=1):
+        with self._counters_lock:
+            self._counters[name] += amount
+
+    def _remember(self, texts, vectors):
+        with self._cache_lock:
+            for text, vector in zip(texts, vectors):
+                # A copy, so a cached row does not keep its whole batch matrix alive
+                self._cache[text] = np.array(vector, dtype=np.float32)
+                self._cache.move_to_end(text)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Skip texts whose caller gave up (see encode) and claim the rest
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            texts = [text for text, _ in batch]
+            try:
+                vectors = self.model.encode(texts, batch_size=len(texts))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self._remember(texts, vectors)
+            self._count("batches")
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def encode(self, sentences, batch_size=None, **kwargs):
+        """Embeds one text (returns a vector) or a list of texts (returns a matrix)."""
+        start = time.perf_counter()
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        vectors = [self._cached(text) for text in texts]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        self._count("cache_hits", len(texts) - len(missing))
+
+        if len(missing) >= self.max_batch:
+            # Bulk ingestion already forms big batches; encode it directly on this thread
+            encoded = self.model.encode([texts[i] for i in missing], batch_size=batch_size or self.max_batch)
+            self._remember([texts[i] for i in missing], encoded)
+            for i, vector in zip(missing, encoded):
+                vectors[i] = vector
+        elif missing:
+            futures = []
+            for i in missing:
+                future = Future()
+                try:
+                    self._queue.put_nowait((texts[i], future))
+                except queue.Full:
+                    for _, queued in futures:
+                        queued.cancel()  # Nobody will wait for them now
+                    self._count("rejected")
+                    raise EmbeddingQueueFull(f"Embedding queue is full ({self._queue.maxsize} waiting)")
+                futures.append((i, future))
+            for i, future in futures:
+                vectors[i] = future.result()
+
+        self._count("texts", len(texts))
+        self._latencies.append(time.perf_counter() - start)
+        result = np.asarray(vectors, dtype=np.float32)
+        return result[0] if single else result
+
+    def stats(self):
+        """Throughput, cache and latency percentile figures since start-up."""
+        latencies = np.array(self._latencies) * 1000 if self._latencies else np.zeros(1)
+        elapsed = time.time() - self._started
+        with self._counters_lock:
+            counters = dict(self._counters)
+        return {
+            **counters,
+            "queue_depth": self._queue.qsize(),
+            "texts_per_second": counters["texts"] / elapsed if elapsed else 0.0,
+            "latency_ms": {
+                "p50": float(np.percentile(latencies, 50)),
+                "p95": float(np.percentile(latencies, 95)),
+                "p99": float(np.percentile(latencies, 99)),
+            },
+        }
+
+class RemoteEmbedder:
+    """encode()-compatible client for the embedding_server.py sidecar."""
+
+    def __init__(self, url=EMBEDDING_SERVICE_URL, timeout=30):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, path, payload=None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(self.url + path, data=data, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            if e.code == 503:
+                # The sidecar's queue is full; surface it like a local one so routes answer 503
+                raise EmbeddingQueueFull(self._error_message(e)) from e
+            raise
+
+    @staticmethod
+    def _error_message(error):
+        try:
+            return json.loads(error.read())["error"]
+        except (ValueError, KeyError, TypeError):
+            return "Embedding service is overloaded"
+
+    def encode(self, sentences, batch_size=None, **kwargs):
+        single = isinstance(sentences, str)
+        body = self._request("/embed", {"texts": [sentences] if single else list(sentences)})
+        matrix = np.frombuffer(base64.b64decode(body["embeddings"]), dtype=np.float32).reshape(body["shape"])
+        return matrix[0] if single else matrix
+
+    def stats(self):
+        return self._request("/stats")
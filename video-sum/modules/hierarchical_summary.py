@@ -0,0 +1,219 @@
+import contextvars
+import hashlib
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import SUMMARY_TOKEN_BUDGET, SUMMARY_GROUP_TOKENS, SUMMARY_WORKERS
+from modules.stage_cache import cached, content_key
+from modules.data_chunk import iter_chunks
+from modules.metrics import propagate_context, log_event
+
+_usage = contextvars.ContextVar("summary_usage", default=None)
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English text)."""
+    return len(text) // 4 + 1
+
+class _Usage:
+    """Token usage reported by the models during one summary level."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def add(self, prompt_tokens, completion_tokens):
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+
+def record_usage(prompt_tokens, completion_tokens):
+    """Counts one model call's reported tokens towards the summary level being run.
+
+    summarize_part and summarize_final call this with the usage from the API
+    response; calls answered from the cache spend nothing and report nothing.
+    """
+    usage = _usage.get()
+    if usage is not None:
+        usage.add(prompt_tokens or 0, completion_tokens or 0)
+
+def _counted(usage, func, *args):
+    token = _usage.set(usage)
+    try:
+        return func(*args)
+    finally:
+        _usage.reset(token)
+
+def total_tokens(report):
+    """Tokens the models reported using across every level of a summary report."""
+    return sum(level.get("prompt_tokens", 0) + level.get("completion_tokens", 0) for level in report)
+
+def split_oversized(texts, max_tokens):
+    """Splits any text longer than max_tokens so each one fits a single call."""
+    pieces = []
+    for text in texts:
+        if estimate_tokens(text) <= max_tokens:
+            pieces.append(text)
+        else:
+            pieces.extend(chunk.text for chunk in iter_chunks(text, max(1, (max_tokens - 1) * 4)))
+    return pieces
+
+def _ends_segment(text, tokens, group_tokens):
+    # Each text is a cut point with probability 2 * tokens / group_tokens, decided by its own hash
+    digest = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "big")
+    return digest < 2 * tokens / group_tokens * 2 ** 64
+
+def group_texts(texts, group_tokens=SUMMARY_GROUP_TOKENS):
+    """Splits texts into groups of at most group_tokens each.
+
+    Whether a text ends a group depends only on its own content and size, so
+    segments average half a group and the size cap only splits inside a segment.
+    An edit to one text therefore only moves the boundaries of its own segment, and
+    the cached summaries of every other group are reused.
+    """
+    groups, current, current_tokens = [], [], 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if current and current_tokens + tokens > group_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+        if _ends_segment(text, tokens, group_tokens):
+            groups.append(current)
+            current, current_tokens = [], 0
+    if current:
+        groups.append(current)
+    return groups
+
+def _summarize_group(summarize_part, name, level, group):
+    return cached(name, content_key(level, *group), lambda: summarize_part("\n".join(group)))
+
+def map_reduce_summary(texts, summarize_part, summarize_final, name,
+                       token_budget=SUMMARY_TOKEN_BUDGET, group_tokens=SUMMARY_GROUP_TOKENS,
+                       workers=SUMMARY_WORKERS, first_level=0):
+    """Summarizes texts of any length within a per-call token budget.
+
+    Groups are summarized in parallel with summarize_part and the results reduced
+    level by level until they fit token_budget, then summarize_final writes the
+    summary. Group summaries are cached under name. Returns the summary and a
+    per-level report of groups, estimated tokens in and out, the tokens the models
+    reported through record_usage, and wall time.
+    """
+    report = []
+    level = first_level
+    texts = split_oversized(texts, group_tokens)
+    while sum(estimate_tokens(t) for t in texts) > token_budget and len(texts) > 1:
+        start = time.perf_counter()
+        groups = group_texts(texts, group_tokens)
+        tokens_in = sum(estimate_tokens(t) for t in texts)
+        usage = _Usage()
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            texts = list(pool.map(propagate_context(
+                lambda group: _counted(usage, _summarize_group, summarize_part, name, level, group)), groups))
+        report.append({
+            "level": level,
+            "groups": len(groups),
+            "tokens_in": tokens_in,
+            "tokens_out": sum(estimate_tokens(t) for t in texts),
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+            "seconds": round(time.perf_counter() - start, 3),
+        })
+        log_event("summary", **report[-1])
+        level += 1
+        if report[-1]["tokens_out"] >= tokens_in:
+            break  # Summaries stopped shrinking; reducing further would loop forever
+        texts = split_oversized(texts, group_tokens)
+
+    start = time.perf_counter()
+    content = "\n".join(texts)
+    usage = _Usage()
+    summary = _counted(usage, summarize_final, content)
+    report.append({
+        "level": level,
+        "groups": 1,
+        "tokens_in": estimate_tokens(content),
+        "tokens_out": estimate_tokens(summary),
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "seconds": round(time.perf_counter() - start, 3),
+    })
+    return summary, report
+
+class StreamingSummary:
+    """map_reduce_summary for texts that arrive in batches, e.g. while a PDF is being read.
+
+    Texts are buffered until they exceed token_budget. From then on each batch is
+    grouped and summarized in the background as it arrives, so only the group
+    summaries are kept. At most max_pending groups wait at a time; add() blocks
+    beyond that.
+    """
+
+    def __init__(self, summarize_part, summarize_final, name, token_budget=SUMMARY_TOKEN_BUDGET,
+                 group_tokens=SUMMARY_GROUP_TOKENS, workers=SUMMARY_WORKERS, max_pending=None):
+        self.summarize_part = summarize_part
+        self.summarize_final = summarize_final
+        self.name = name
+        self.token_budget = token_budget
+        self.group_tokens = group_tokens
+        self.workers = max(1, workers)
+        self.max_pending = max_pending or self.workers * 4
+        self._pool = ThreadPoolExecutor(max_workers=self.workers)
+        self._buffer, self._buffer_tokens = [], 0
+        self._pending = deque()  # Group summary futures, oldest first
+        self._summaries = []
+        self._mapping = False
+        self._start = time.perf_counter()
+        self._tokens_in = 0
+        self._groups = 0
+        self._usage = _Usage()
+
+    def add(self, texts):
+        for text in split_oversized(texts, self.group_tokens):
+            self._buffer.append(text)
+            self._buffer_tokens += estimate_tokens(text)
+        if self._buffer_tokens > self.token_budget:
+            self._mapping = True  # Too long for one call; start the map step now
+        if self._mapping and self._buffer_tokens >= self.group_tokens:
+            self._submit()
+
+    def _submit(self):
+        for group in group_texts(self._buffer, self.group_tokens):
+            while len(self._pending) >= self.max_pending:
+                self._summaries.append(self._pending.popleft().result())
+            self._pending.append(self._pool.submit(
+                propagate_context(_counted), self._usage, _summarize_group, self.summarize_part, self.name, 0, group))
+            self._groups += 1
+        self._tokens_in += self._buffer_tokens
+        self._buffer, self._buffer_tokens = [], 0
+
+    def finish(self):
+        """Waits for the map step and writes the summary; returns it and the per-level report."""
+        try:
+            if not self._mapping:
+                return map_reduce_summary(self._buffer, self.summarize_part, self.summarize_final, self.name,
+                                          self.token_budget, self.group_tokens, self.workers)
+            if self._buffer:
+                self._submit()
+            self._summaries.extend(future.result() for future in self._pending)
+            first = {
+                "level": 0,
+                "groups": self._groups,
+                "tokens_in": self._tokens_in,
+                "tokens_out": sum(estimate_tokens(t) for t in self._summaries),
+                "prompt_tokens": self._usage.prompt_tokens,
+                "completion_tokens": self._usage.completion_tokens,
+                "seconds": round(time.perf_counter() - self._start, 3),
+            }
+            log_event("summary", **first)
+            summary, report = map_reduce_summary(self._summaries, self.summarize_part, self.summarize_final, self.name,
+                                                 self.token_budget, self.group_tokens, self.workers, first_level=1)
+            return summary, [first] + report
+        finally:
+            self.close()
+
+    def close(self):
+        """Stops the background map step, dropping groups not yet started."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
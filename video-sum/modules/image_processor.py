@@ -1,58 +1,116 @@
-import glob
 import os
+import re
 import ollama
-import shutil
-
-def process_images_in_batches(image_list,transcription, batch_size=4):
-    """Processes images in batches using Ollama and returns the combined frame descriptions."""
-    
-    frame_data = ""  # Initialize frame data string to store the descriptions
-    prev_frame_data = ""
-    for i in range(0, len(image_list), batch_size):
-        batch_images = image_list[i:i + batch_size]
-        response = ollama.chat(
-            model='gemma3', 
-            messages=[{
-                'role': 'user', 
-                'content': f"""
-                    You have been provided with several frames of a video.
-                Here is the **transcribed audio** that accompanies the video:
-
-                **Transcription:**
-                {transcription}
-
-                Here is the **previous frame data** to maintain continuity:
-
-                **Previous Frame Data:**
-                {prev_frame_data}
-
-                **Task:**
-                - Describe what is happening in the current frames based on both the previous frame data and the transcription.
-                - Ensure the description flows seamlessly from the previous frames.
-                - Use details from the transcription to enrich the scene description, explaining what is happening visually in the current frame.
-                - Avoid technical terms (like frames or images); focus solely on the events, actions, and context.
-                - Keep the narrative natural and engaging, as if explaining a scene to someone who hasn’t seen the video.
-
-                """,
-                'images': batch_images
-            }]
-        )
-
-        # Append the frame description returned by Ollama
-        frame_description = response['message']['content']
-        frame_data += frame_description + "\n"
-        prev_frame_data = frame_description
-        print(f"Batch {i//batch_size + 1} processed: {frame_description}")
-
-    return frame_data.strip()  # Return the collected frame data
-
-def process_frames(video_path,transcription):
-    """Extracts frames and processes them."""
-    frame_dir = os.path.join(os.path.dirname(__file__), "../static/frames")
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import VISION_WORKERS, VISION_CONTEXT_SECONDS, VISION_STITCH
+from modules.video_processing import frame_timestamp
+from modules.stage_cache import cached, content_key, file_hash
+from modules.metrics import propagate_context, log_event
+
+VISION_MODEL = 'gemma3'
+
+def transcription_window(transcription, segments, start, end, duration, margin=VISION_CONTEXT_SECONDS):
+    """Returns only the part of the transcription spoken around [start, end] seconds."""
+    start, end = start - margin, end + margin
+    if segments:
+        return " ".join(s["text"] for s in segments if s["end"] >= start and s["start"] <= end)
+    if not duration:
+        return transcription
+    # Without segment timestamps, assume speech is spread evenly over the video
+    lo = max(0, int(len(transcription) * start / duration))
+    hi = min(len(transcription), int(len(transcription) * end / duration) + 1)
+    return transcription[lo:hi]
+
+def describe_batch(batch_images, transcript_window):
+    """Describes one batch of frames using only its aligned transcript window."""
+    key = content_key(VISION_MODEL, transcript_window, *(file_hash(image) for image in batch_images))
+    return cached("vision", key, lambda: _request_description(batch_images, transcript_window))
+
+def _request_description(batch_images, transcript_window):
+    response = ollama.chat(
+        model=VISION_MODEL, 
+        messages=[{
+            'role': 'user', 
+            'content': f"""
+                You have been provided with several frames of a video.
+            Here is the **transcribed audio** spoken while these frames were shown:
+
+            **Transcription:**
+            {transcript_window}
+
+            **Task:**
+            - Describe what is happening in the current frames based on the transcription.
+            - Use details from the transcription to enrich the scene description, explaining what is happening visually in the current frame.
+            - Avoid technical terms (like frames or images); focus solely on the events, actions, and context.
+            - Keep the narrative natural and engaging, as if explaining a scene to someone who hasn’t seen the video.
+
+            """,
+            'images': batch_images
+        }]
+    )
+    return response['message']['content']
+
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+
+def _words(sentence):
+    return set(re.findall(r"\w+", sentence.lower()))
+
+def _restates(sentence, earlier, similarity=0.8):
+    words = _words(sentence)
+    return bool(words) and any(len(words & other) / len(words | other) >= similarity for other in earlier if other)
+
+def stitch_description(prev_description, description, tail_sentences=3):
+    """Drops opening sentences of description that restate the end of the previous one.
+
+    Neighbouring batches share transcript context, so their descriptions often
+    repeat the same moment at the boundary. Only that boundary is compared, locally
+    and without another model call; at least one sentence is always kept.
+    """
+    tail = [_words(sentence) for sentence in _SENTENCE_BREAK.split(prev_description.strip())[-tail_sentences:]]
+    text = description.strip()
+    starts = [0] + [match.end() for match in _SENTENCE_BREAK.finditer(text)]
+    for i, start in enumerate(starts[:-1]):
+        if not _restates(text[start:starts[i + 1]], tail):
+            return text[start:]
+    return text[starts[-1]:]
+
+def process_images_in_batches(image_list, transcription, batch_size=4, segments=None,
+                              workers=VISION_WORKERS, stitch=VISION_STITCH, checkpoints=None):
+    """Processes images in batches using Ollama and returns the combined frame descriptions.
+
+    With checkpoints (a JobCheckpoints), each finished batch is saved so a retried
+    job only describes the batches it had not finished.
+    """
+    batches = [image_list[i:i + batch_size] for i in range(0, len(image_list), batch_size)]
+    if not batches:
+        return ""
+    duration = frame_timestamp(image_list[-1])
+    windows = [
+        transcription_window(transcription, segments, frame_timestamp(b[0]), frame_timestamp(b[-1]), duration)
+        for b in batches
+    ]
+
+    def describe(i, batch, window):
+        if checkpoints is None:
+            return describe_batch(batch, window)
+        return checkpoints.memo(f"vision-{i}", lambda: describe_batch(batch, window))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        descriptions = list(pool.map(propagate_context(describe), range(len(batches)), batches, windows))
+        log_event("vision", described_batches=len(batches))
+
+    if stitch and len(descriptions) > 1:
+        descriptions = descriptions[:1] + [
+            stitch_description(prev, description) for prev, description in zip(descriptions, descriptions[1:])
+        ]
+
+    return "\n".join(descriptions).strip()  # Return the collected frame data
+
+def process_frames(frame_dir, transcription, segments=None, checkpoints=None):
+    """Processes the extracted frames in frame_dir."""
     frames = sorted(os.listdir(frame_dir), key=lambda x: int(x.split('_')[1].split('.')[0]))
     image_list = [os.path.join(frame_dir, frame) for frame in frames]
 
     # Process images and get the frame data
-    frame_data = process_images_in_batches(image_list,transcription)
-    shutil.rmtree(frame_dir)
+    frame_data = process_images_in_batches(image_list, transcription, segments=segments, checkpoints=checkpoints)
     return frame_data  # Return the frame data
@@ -0,0 +1,266 @@
+import atexit
+import importlib
+import json
+import multiprocessing
+import os
+import signal
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from config.settings import JOBS_DB, JOB_WORKERS, JOB_RETENTION_SECONDS
+from modules.metrics import current_trace_id, set_trace_id, flush, log_event
+from modules.checkpoints import JobCheckpoints, prune_checkpoints
+
+class JobCancelled(Exception):
+    """Raised inside a running job once its cancellation has been requested."""
+
+def _open():
+    conn = sqlite3.connect(JOBS_DB, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            handler TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL,
+            stage TEXT,
+            progress REAL NOT NULL DEFAULT 0,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            worker_pid INTEGER,
+            result TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """)
+    return conn
+
+def enqueue(handler, payload, uploads=()):
+    """Queues handler ("module:function") to run with payload; returns the job ID.
+
+    uploads are files the job owns: they are deleted once it succeeds, or once it
+    failed or was cancelled and was not retried within JOB_RETENTION_SECONDS.
+    """
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    # Carry the request's trace ID so the job's stage logs can be tied back to the upload
+    payload = {**payload, "trace_id": current_trace_id() or job_id, "uploads": list(uploads)}
+    with closing(_open()) as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, handler, payload, status, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+            (job_id, handler, json.dumps(payload), now, now),
+        )
+    return job_id
+
+def get_job(job_id):
+    """Returns a job's public status fields, or None if it does not exist."""
+    with closing(_open()) as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    return {
+        "job_id": row["id"],
+        "status": row["status"],
+        "stage": row["stage"],
+        "progress": row["progress"],
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "error": row["error"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+    }
+
+def cancel_job(job_id):
+    """Cancels a queued job outright, or flags a running one to stop at its next progress report."""
+    now = time.time()
+    with closing(_open()) as conn:
+        conn.execute(
+            "UPDATE jobs SET status = 'cancelled', updated_at = ? WHERE id = ? AND status = 'queued'",
+            (now, job_id),
+        )
+        conn.execute(
+            "UPDATE jobs SET cancel_requested = 1, updated_at = ? WHERE id = ? AND status = 'running'",
+            (now, job_id),
+        )
+    return get_job(job_id)
+
+def retry_job(job_id):
+    """Re-queues a failed or cancelled job; it resumes from its checkpoints."""
+    with closing(_open()) as conn:
+        conn.execute(
+            "UPDATE jobs SET status = 'queued', cancel_requested = 0, worker_pid = NULL, error = NULL, updated_at = ? "
+            "WHERE id = ? AND status IN ('failed', 'cancelled')",
+            (time.time(), job_id),
+        )
+    return get_job(job_id)
+
+def _claim_next_job():
+    conn = _open()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1").fetchone()
+        if row is not None:
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker_pid = ?, updated_at = ? WHERE id = ?",
+                (os.getpid(), time.time(), row["id"]),
+            )
+        conn.execute("COMMIT")
+        return row
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+def _finish(job_id, status, result=None, error=None):
+    with closing(_open()) as conn:
+        conn.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ?, progress = CASE WHEN ? = 'done' THEN 1 ELSE progress END WHERE id = ?",
+            (status, json.dumps(result) if result is not None else None, error, time.time(), status, job_id),
+        )
+
+def _progress_reporter(job_id):
+    def report(stage, progress):
+        with closing(_open()) as conn:
+            conn.execute(
+                "UPDATE jobs SET stage = ?, progress = ?, updated_at = ? WHERE id = ?",
+                (stage, progress, time.time(), job_id),
+            )
+            cancelled = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+        if cancelled:
+            raise JobCancelled(job_id)
+    return report
+
+def _discard_files(row):
+    """Deletes a job's uploads, checkpoints and scratch files; it cannot be retried afterwards."""
+    for path in json.loads(row["payload"]).get("uploads", []):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    JobCheckpoints(row["id"]).clear()
+
+# Handlers that moved out of the Flask app modules, for jobs queued before the move
+_MOVED_HANDLERS = {"pdf:process_pdf_upload": "modules.pdf_pipeline:process_pdf_upload"}
+
+def run_job(row):
+    """Runs one claimed job, recording its result, failure or cancellation."""
+    module_name, func_name = _MOVED_HANDLERS.get(row["handler"], row["handler"]).split(":")
+    payload = json.loads(row["payload"])
+    set_trace_id(payload.get("trace_id") or row["id"])
+    try:
+        handler = getattr(importlib.import_module(module_name), func_name)
+        # Handlers checkpoint their progress under the job ID so a retry can resume
+        result = handler({**payload, "job_id": row["id"]}, _progress_reporter(row["id"]))
+        # Only once the job is recorded as done, so a crash before this leaves it resumable
+        _finish(row["id"], "done", result=result)
+        _discard_files(row)
+    except JobCancelled:
+        _finish(row["id"], "cancelled")
+    except Exception as e:
+        log_event("job", job_id=row["id"], failed=True, error=str(e))
+        _finish(row["id"], "failed", error=str(e))
+    finally:
+        flush(min_interval=0)
+
+def run_pending_jobs():
+    """Runs queued jobs in this process until the queue is empty; returns how many ran."""
+    ran = 0
+    while True:
+        row = _claim_next_job()
+        if row is None:
+            return ran
+        run_job(row)
+        ran += 1
+
+def worker_loop(poll_interval=1.0, expire_interval=3600.0):
+    """Claims and runs queued jobs forever, expiring stale failed jobs when idle."""
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()  # Own process group, so _stop_workers also reaches the job's extraction processes
+    last_expiry = time.time()
+    while True:
+        row = _claim_next_job()
+        if row is None:
+            if time.time() - last_expiry >= expire_interval:
+                expire_jobs()
+                last_expiry = time.time()
+            time.sleep(poll_interval)
+            continue
+        run_job(row)
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def recover_jobs():
+    """Re-queues jobs left 'running' by worker processes that have died."""
+    with closing(_open()) as conn:
+        rows = conn.execute("SELECT id, worker_pid FROM jobs WHERE status = 'running'").fetchall()
+        for row in rows:
+            if row["worker_pid"] is None or not _pid_alive(row["worker_pid"]):
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', worker_pid = NULL, updated_at = ? WHERE id = ?",
+                    (time.time(), row["id"]),
+                )
+
+def expire_jobs(max_age=JOB_RETENTION_SECONDS):
+    """Gives up on failed and cancelled jobs not retried within max_age seconds, deleting their files."""
+    cutoff = time.time() - max_age
+    expired = []
+    with closing(_open()) as conn:
+        rows = conn.execute(
+            "SELECT id, payload FROM jobs WHERE status IN ('failed', 'cancelled') AND updated_at < ?", (cutoff,)
+        ).fetchall()
+        for row in rows:
+            # Guarded on status so a job retried meanwhile keeps its files
+            updated = conn.execute(
+                "UPDATE jobs SET status = 'expired', updated_at = ? WHERE id = ? AND status IN ('failed', 'cancelled')",
+                (time.time(), row["id"]),
+            ).rowcount
+            if updated:
+                expired.append(row)
+    for row in expired:
+        _discard_files(row)
+    return len(expired)
+
+def prune_finished_checkpoints():
+    """Expires stale failed jobs and drops files of jobs that finished or no longer exist.
+
+    Failed and cancelled jobs keep theirs for retries until they expire; done jobs
+    are swept too in case a worker died between finishing one and cleaning up.
+    """
+    expire_jobs()
+    with closing(_open()) as conn:
+        finished = conn.execute("SELECT id, payload FROM jobs WHERE status = 'done'").fetchall()
+        rows = conn.execute("SELECT id FROM jobs WHERE status NOT IN ('done', 'expired')").fetchall()
+    for row in finished:
+        _discard_files(row)
+    prune_checkpoints({row["id"] for row in rows})
+
+def _stop_workers(workers):
+    for worker in workers:
+        if worker.is_alive():
+            try:
+                os.killpg(worker.pid, signal.SIGTERM)
+            except (AttributeError, ProcessLookupError, PermissionError):
+                worker.terminate()  # No process group (yet, or on this platform)
+
+def start_workers(count=JOB_WORKERS):
+    """Starts count worker processes, stopped when this process exits, and returns them."""
+    os.makedirs(os.path.dirname(os.path.abspath(JOBS_DB)), exist_ok=True)
+    recover_jobs()
+    prune_finished_checkpoints()
+    workers = []
+    for _ in range(max(1, count)):
+        # Not daemonic: jobs may start process pools of their own (e.g. PDF extraction)
+        worker = multiprocessing.Process(target=worker_loop)
+        worker.start()
+        workers.append(worker)
+    atexit.register(_stop_workers, workers)
+    return workers
@@ -0,0 +1,25 @@
+from flask import Blueprint, jsonify
+from modules.job_queue import get_job, cancel_job, retry_job
+
+jobs_blueprint = Blueprint("jobs", __name__)
+
+@jobs_blueprint.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found!"}), 404
+    return jsonify(job), 200
+
+@jobs_blueprint.route("/jobs/<job_id>/cancel", methods=["POST"])
+def job_cancel(job_id):
+    job = cancel_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found!"}), 404
+    return jsonify(job), 200
+
+@jobs_blueprint.route("/jobs/<job_id>/retry", methods=["POST"])
+def job_retry(job_id):
+    job = retry_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found!"}), 404
+    return jsonify(job), 200
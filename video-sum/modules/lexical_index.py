@@ -0,0 +1,108 @@
+import re
+import numpy as np
+
+# Words, numbers and identifiers such as snake_case, file.py, gpt-4 or 3.14
+_TOKEN = re.compile(r"[a-z0-9_]+(?:[.\-][a-z0-9_]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or that the this "
+    "to was were will with what which who how why when where do does did can".split()
+)
+
+
+def tokenize(text):
+    """Lower-cased terms of text; compound identifiers also yield their parts."""
+    terms = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        terms.append(token)
+        if "." in token or "-" in token:
+            terms.extend(part for part in re.split(r"[.\-]", token) if part and part not in STOPWORDS)
+    return terms
+
+
+class BM25Index:
+    """BM25 over one document's chunks, with postings held in flat NumPy arrays.
+
+    Postings are stored term-major (CSR layout): the entries of term t are
+    docs[offsets[t]:offsets[t + 1]] with their term frequencies in tfs.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary = {}
+        self.doc_lengths = np.zeros(0, dtype=np.float32)
+        # Swapped as a whole so a concurrent search always sees a consistent index
+        self._postings = (np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32),
+                          np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32))
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, texts):
+        """Indexes texts as the next documents; call from one thread at a time."""
+        new_terms, new_docs, new_tfs, lengths = [], [], [], []
+        first = len(self.doc_lengths)
+        for doc, text in enumerate(texts, start=first):
+            terms = tokenize(text)
+            lengths.append(len(terms))
+            if not terms:
+                continue
+            ids = np.fromiter((self.vocabulary.setdefault(t, len(self.vocabulary)) for t in terms), dtype=np.int64, count=len(terms))
+            unique, counts = np.unique(ids, return_counts=True)
+            new_terms.append(unique)
+            new_tfs.append(counts)
+            new_docs.append(np.full(len(unique), doc, dtype=np.int32))
+        if not lengths:
+            return
+
+        offsets, docs, tfs, _, _ = self._postings
+        # Expand the existing postings back to (term, doc, tf) triples and merge in the new ones
+        term_ids = np.concatenate([np.repeat(np.arange(len(offsets) - 1), np.diff(offsets)), *new_terms])
+        docs = np.concatenate([docs, *new_docs])
+        tfs = np.concatenate([tfs, *new_tfs]).astype(np.float32)
+        order = np.argsort(term_ids, kind="stable")  # Stable keeps each term's docs in order
+
+        doc_freq = np.bincount(term_ids, minlength=len(self.vocabulary))
+        doc_lengths = np.concatenate([self.doc_lengths, np.array(lengths, dtype=np.float32)])
+        n = len(doc_lengths)
+        idf = np.log1p((n - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+        norm = (self.k1 * (1 - self.b + self.b * doc_lengths / max(doc_lengths.mean(), 1.0))).astype(np.float32)
+
+        self._postings = (np.concatenate([[0], np.cumsum(doc_freq)]), docs[order], tfs[order], idf, norm)
+        self.doc_lengths = doc_lengths
+
+    def search(self, query, top_k=5):
+        """Returns up to top_k (score, document number) pairs, best first."""
+        offsets, docs, tfs, idf, norm = self._postings
+        term_ids = {self.vocabulary.get(term) for term in tokenize(query)}
+        term_ids = [t for t in term_ids if t is not None and t < len(idf)]
+        if not term_ids or top_k <= 0:
+            return []
+
+        scores = np.zeros(len(norm), dtype=np.float32)
+        for t in term_ids:
+            start, end = offsets[t], offsets[t + 1]
+            matched, tf = docs[start:end], tfs[start:end]
+            # A term lists each doc at most once, so the fancy-indexed += is safe
+            scores[matched] += idf[t] * tf * (self.k1 + 1) / (tf + norm[matched])
+
+        hits = np.flatnonzero(scores)
+        if len(hits) > top_k:
+            hits = hits[np.argpartition(-scores[hits], top_k - 1)[:top_k]]
+        hits = hits[np.argsort(-scores[hits])]
+        return [(float(scores[i]), int(i)) for i in hits]
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuses ranked lists of ids; returns (id, score) pairs, best first.
+
+    Each list contributes 1 / (k + rank) per id, so no score scaling is needed
+    between dense and lexical results.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda pair: pair[1], reverse=True)
@@ -0,0 +1,225 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from config.settings import METRICS_DIR
+
+try:
+    import fcntl  # Serialises folding dead processes' snapshots; unavailable on Windows
+except ImportError:
+    fcntl = None
+
+# Pipeline stages, in the order they appear in /metrics
+STAGES = ["extraction", "transcription", "vision", "summary", "embedding", "db_write", "retrieval", "generation"]
+
+_trace_id = contextvars.ContextVar("trace_id", default=None)
+_lock = threading.Lock()
+# (metric name, stage, kind) -> value; kind is "" for metrics without a kind label
+_values = {}
+_flush_lock = threading.Lock()
+_last_flush = 0.0
+
+_HELP = {
+    "insightai_stage_seconds_total": ("counter", "Wall time spent in each pipeline stage"),
+    "insightai_stage_runs_total": ("counter", "Completed runs of each pipeline stage"),
+    "insightai_stage_errors_total": ("counter", "Runs of each pipeline stage that raised"),
+    "insightai_stage_bytes_total": ("counter", "Bytes processed by each pipeline stage"),
+    "insightai_stage_tokens_total": ("counter", "Tokens sent to or received from models, as reported by the API where available"),
+    "insightai_stage_items_total": ("counter", "Frames, chunks, rows or batches handled by each stage"),
+    "insightai_stage_rss_bytes": ("gauge", "Highest resident memory seen at the end of each stage"),
+}
+
+def current_trace_id():
+    return _trace_id.get()
+
+def set_trace_id(trace_id=None):
+    """Sets (or generates) the trace ID for the current request, job or thread."""
+    trace_id = trace_id or uuid.uuid4().hex
+    _trace_id.set(trace_id)
+    return trace_id
+
+def propagate_context(func):
+    """Wraps func to run in a copy of the caller's context, e.g. its trace ID.
+
+    Pool threads do not inherit context variables, so wrap what is handed to
+    ThreadPoolExecutor.submit/map.
+    """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(func, *args, **kwargs)
+
+def _rss_bytes():
+    """Current resident memory of this process, or None where /proc is unavailable.
+
+    Unlike ru_maxrss (the lifetime peak) this reflects what a stage left behind.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _add(name, stage, value, kind=""):
+    key = (name, stage, kind)
+    with _lock:
+        if _HELP[name][0] == "gauge":
+            _values[key] = max(_values.get(key, 0), value)
+        else:
+            _values[key] = _values.get(key, 0) + value
+
+def log_event(stage, **fields):
+    """Prints one structured JSON log line tagged with the current trace ID."""
+    print(json.dumps({"trace_id": current_trace_id(), "stage": stage, **fields}, default=str))
+
+class StageRecorder:
+    """Collects sizes for one stage run; call add() inside a stage() block."""
+
+    def __init__(self, name):
+        self.name = name
+        self.fields = {}
+
+    def add(self, bytes=0, tokens=0, **items):
+        if bytes:
+            _add("insightai_stage_bytes_total", self.name, bytes)
+            self.fields["bytes"] = self.fields.get("bytes", 0) + bytes
+        if tokens:
+            _add("insightai_stage_tokens_total", self.name, tokens)
+            self.fields["tokens"] = self.fields.get("tokens", 0) + tokens
+        for kind, count in items.items():
+            _add("insightai_stage_items_total", self.name, count, kind)
+            self.fields[kind] = self.fields.get(kind, 0) + count
+
+@contextmanager
+def stage(name):
+    """Times a pipeline stage and records its wall time, sizes and memory."""
+    recorder = StageRecorder(name)
+    start = time.perf_counter()
+    rss_before = _rss_bytes()
+    failed = False
+    try:
+        yield recorder
+    except GeneratorExit:
+        raise  # A streaming consumer stopped early (e.g. the client disconnected); not a failure
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        _add("insightai_stage_seconds_total", name, seconds)
+        _add("insightai_stage_runs_total", name, 1)
+        if failed:
+            _add("insightai_stage_errors_total", name, 1)
+        memory = {}
+        rss = _rss_bytes()
+        if rss is not None:
+            _add("insightai_stage_rss_bytes", name, rss)
+            # Threads share the process, so the delta also includes concurrent stages
+            memory = {"rss_mb": round(rss / 2 ** 20, 1), "rss_delta_mb": round((rss - rss_before) / 2 ** 20, 1)}
+        log_event(name, seconds=round(seconds, 3), failed=failed, **memory, **recorder.fields)
+        try:
+            flush()
+        except OSError as e:
+            # Metrics are best-effort; never fail the request or job being measured
+            log_event("metrics", error=f"Could not write metrics: {e}")
+
+def flush(min_interval=1.0):
+    """Writes this process's metrics where /metrics in any process can merge them."""
+    global _last_flush
+    # Threads (summary pools, /metrics scrapes) flush concurrently; one writes at a time
+    with _flush_lock:
+        now = time.time()
+        if now - _last_flush < min_interval:
+            return
+        _last_flush = now
+        with _lock:
+            snapshot = [[name, stage_name, kind, value] for (name, stage_name, kind), value in _values.items()]
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _combine(merged, snapshot):
+    for metric, stage_name, kind, value in snapshot:
+        if metric not in _HELP:
+            continue  # Written by an older version
+        key = (metric, stage_name, kind)
+        if _HELP[metric][0] == "gauge":
+            merged[key] = max(merged.get(key, 0), value)
+        else:
+            merged[key] = merged.get(key, 0) + value
+
+def _load(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+def _retire(path):
+    """Folds a dead process's snapshot into retired.json so its counters outlive the file."""
+    claimed = f"{path}.{os.getpid()}.retiring"
+    try:
+        os.rename(path, claimed)  # Only one process wins the rename
+    except FileNotFoundError:
+        return
+    retired_path = os.path.join(METRICS_DIR, "retired.json")
+    with open(os.path.join(METRICS_DIR, ".retired.lock"), "w") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        merged = {}
+        _combine(merged, _load(retired_path))
+        _combine(merged, _load(claimed))
+        tmp_path = f"{retired_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump([[*key, value] for key, value in merged.items()], f)
+        os.replace(tmp_path, retired_path)
+    os.remove(claimed)
+
+def _merged():
+    flush(min_interval=0)
+    for name in os.listdir(METRICS_DIR):
+        pid = name[:-len(".json")]
+        if name.endswith(".json") and pid.isdigit() and not _pid_alive(int(pid)):
+            _retire(os.path.join(METRICS_DIR, name))
+
+    merged = {}
+    for name in os.listdir(METRICS_DIR):
+        if name.endswith(".json"):
+            _combine(merged, _load(os.path.join(METRICS_DIR, name)))
+    return merged
+
+def render_prometheus():
+    """All processes' metrics in the Prometheus text exposition format."""
+    merged = _merged()
+    lines = []
+    for metric, (metric_type, help_text) in _HELP.items():
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {metric_type}")
+        keys = sorted(
+            (k for k in merged if k[0] == metric),
+            key=lambda k: (STAGES.index(k[1]) if k[1] in STAGES else len(STAGES), k[1], k[2]),
+        )
+        for _, stage_name, kind in keys:
+            labels = f'stage="{stage_name}"' + (f',kind="{kind}"' if kind else "")
+            lines.append(f"{metric}{{{labels}}} {merged[(metric, stage_name, kind)]}")
+    return "\n".join(lines) + "\n"
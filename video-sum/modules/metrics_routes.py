@@ -0,0 +1,17 @@
+from flask import Blueprint, Response, request, g
+from modules.metrics import render_prometheus, set_trace_id
+
+metrics_blueprint = Blueprint("metrics", __name__)
+
+@metrics_blueprint.before_app_request
+def start_trace():
+    g.trace_id = set_trace_id(request.headers.get("X-Request-ID"))
+
+@metrics_blueprint.after_app_request
+def return_trace(response):
+    response.headers["X-Request-ID"] = g.get("trace_id", "")
+    return response
+
+@metrics_blueprint.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
@@ -1,31 +1,71 @@
 import ollama
+from modules.metrics import stage, log_event
+from modules.hierarchical_summary import estimate_tokens
 
-def get_ollama_response(content):
-    """Get response from the Ollama model based on content."""
-    try:
-        print("context "+content)
-        response = ollama.chat(
-            model="gemma3", 
-            messages=[
-                # {"role": "system", "content": """
-                #     You are an AI assistant that provides answers strictly based on the given video content. 
-                #     You are provided with:
-                #     - Context: A detailed description of what is happening in the video.
-                #     - Summary: A structured explanation of the video's content, including its main points.
+# Returned in place of a model answer when Ollama cannot be reached
+FALLBACK_ANSWER = "Sorry, I couldn't process the request."
+
+class GenerationFailed(Exception):
+    """Raised when Ollama fails before the answer is complete."""
+
+def request_ollama_response(content):
+    """Get response from the Ollama model based on content; raises GenerationFailed on error.
+
+    Used where a fallback answer must not be mistaken for a real one, e.g. summaries that are cached.
+    """
+    with stage("generation") as recorder:
+        try:
+            response = ollama.chat(
+                model="gemma3", 
+                messages=[
+                    # {"role": "system", "content": """
+                    #     You are an AI assistant that provides answers strictly based on the given video content. 
+                    #     You are provided with:
+                    #     - Context: A detailed description of what is happening in the video.
+                    #     - Summary: A structured explanation of the video's content, including its main points.
                     
-                #     Your goal:
-                #     - Use both the **Context** and **Summary** to answer questions accurately.
-                #     - If asked for a summary, extract the most relevant details from the provided summary.
-                #     - If the user asks something not explicitly covered, infer the best possible answer using the given content.
-                #     - Only respond with "The provided content does not contain relevant details" if **neither** the context nor the summary contains an answer.
+                    #     Your goal:
+                    #     - Use both the **Context** and **Summary** to answer questions accurately.
+                    #     - If asked for a summary, extract the most relevant details from the provided summary.
+                    #     - If the user asks something not explicitly covered, infer the best possible answer using the given content.
+                    #     - Only respond with "The provided content does not contain relevant details" if **neither** the context nor the summary contains an answer.
                     
-                #     Be concise and to the point while maintaining clarity.
-                #  """
-                # },
-                {"role": "user", "content": content}
-                ]
-        )
+                    #     Be concise and to the point while maintaining clarity.
+                    #  """
+                    # },
+                    {"role": "user", "content": content}
+                    ]
+            )
+        except Exception as e:
+            raise GenerationFailed(f"Error communicating with Ollama API: {e}") from e
+        recorder.add(tokens=estimate_tokens(content) + estimate_tokens(response["message"]["content"]))
         return response
-    except Exception as e:
-        print(f"Error communicating with Ollama API: {e}")
-        return {"message": {"content": "Sorry, I couldn't process the request."}}
+
+def get_ollama_response(content):
+    """Get response from the Ollama model based on content, or FALLBACK_ANSWER if it cannot be reached."""
+    try:
+        return request_ollama_response(content)
+    except GenerationFailed as e:
+        log_event("generation", error=str(e))
+        return {"message": {"content": FALLBACK_ANSWER}}
+
+def stream_ollama_response(content):
+    """Yields the Ollama model's answer token by token as it is generated.
+
+    Raises GenerationFailed if Ollama fails, so a partial answer is never taken for a whole one.
+    """
+    with stage("generation") as recorder:
+        recorder.add(tokens=estimate_tokens(content))
+        try:
+            for chunk in ollama.chat(
+                model="gemma3",
+                messages=[{"role": "user", "content": content}],
+                stream=True,
+            ):
+                token = chunk["message"]["content"]
+                if token:
+                    recorder.add(tokens=estimate_tokens(token))
+                    yield token
+        except Exception as e:
+            log_event("generation", error=f"Error communicating with Ollama API: {e}")
+            raise GenerationFailed(FALLBACK_ANSWER) from e
@@ -0,0 +1,47 @@
+import itertools
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import fitz  # PyMuPDF
+from config.settings import PDF_WORKERS, PDF_PAGES_PER_TASK
+
+def page_count(pdf_path):
+    with fitz.open(pdf_path) as doc:
+        return len(doc)
+
+def extract_page_range(pdf_path, start, end):
+    """(page_num, text) for pages [start, end), using 'blocks' for better accuracy and skipping empty pages."""
+    pages = []
+    with fitz.open(pdf_path) as doc:
+        for page_num in range(start, end):
+            blocks = doc[page_num].get_text("blocks")
+            text = "\n".join(block[4] for block in blocks)
+            if text.strip():
+                pages.append((page_num + 1, text))
+    return pages
+
+def _pool_context():
+    # Not fork: the job worker has threads (e.g. the summary pool) whose locks a forked child could inherit held
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+def iter_pdf_pages(pdf_path, workers=PDF_WORKERS, pages_per_task=PDF_PAGES_PER_TASK):
+    """Yields (page_num, text) in page order while a process pool extracts the pages ahead.
+
+    At most two page ranges per worker are in flight, so memory does not grow with the page count.
+    """
+    total = page_count(pdf_path)
+    ranges = [(start, min(start + pages_per_task, total)) for start in range(0, total, pages_per_task)]
+    if workers <= 1 or len(ranges) <= 1:
+        for start, end in ranges:
+            yield from extract_page_range(pdf_path, start, end)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+        remaining = iter(ranges)
+        pending = deque(pool.submit(extract_page_range, pdf_path, *r) for r in itertools.islice(remaining, workers * 2))
+        while pending:
+            pages = pending.popleft().result()
+            for r in itertools.islice(remaining, 1):
+                pending.append(pool.submit(extract_page_range, pdf_path, *r))
+            yield from pages
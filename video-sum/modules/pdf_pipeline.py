@@ -0,0 +1,173 @@
+import itertools
+from config.settings import supabase, embedder, PDF_STREAM_BATCH
+from modules.ollama_helper import request_ollama_response
+from modules.hierarchical_summary import StreamingSummary, record_usage, total_tokens
+from modules.data_chunk import chunk_pages
+from modules.pdf_extraction import iter_pdf_pages, page_count
+from modules.vector_index import drop_index
+from modules import corpus_index
+from modules.bulk_writer import store_chunks, delete_stale_chunks
+from modules.checkpoints import JobCheckpoints
+from modules.metrics import stage, log_event
+
+
+# --- Chunking Process ---
+def stream_pdf_chunks(pdf_path, chunk_size=1000, overlap=200):
+    """Yields Chunks tagged with their page number as soon as their pages are extracted."""
+    return chunk_pages(iter_pdf_pages(pdf_path), chunk_size, overlap)
+
+
+def summarize_section(text):
+    """Map step: condenses one group of chunks for the final summary."""
+    prompt = f"""
+    Summarize this section of a document. Keep its title, headings, names, dates, key findings and conclusions:
+
+    {text}
+    """
+    return _counted_answer(prompt)
+
+
+def summarize_document(content):
+    prompt = f"""
+    Summarize the following document content:
+
+    {content}
+    Summary Instructions:
+
+    Please generate a detailed and coherent summary of the above document, analyzing it as a complete work (e.g., book, research paper, or report) — not just as raw text or segmented chunks.
+
+    Your summary should include:
+
+    Document Identity:
+
+    Title (if identifiable)
+
+    Author(s)
+
+    Type of document (e.g., book, report, academic paper, manual)
+
+    Date of publication (if present)
+
+    Main Purpose:
+
+    What is the primary aim or objective of this document?
+
+    Who is the intended audience?
+
+    Content Overview:
+
+    Key topics and themes covered
+
+    Structure of the content (chapters, sections, flow of arguments)
+
+    Any important conclusions, takeaways, or findings
+
+    Contextual Insight:
+
+    If the document is a book, summarize it as such — highlighting narrative structure, core messages, or lessons.
+
+    If it is academic or technical, identify the problem it addresses, the methodology used, and the results or insights.
+
+    Avoid referring to internal data processing concepts like “chunks.” The summary should read naturally and professionally, as if written by someone who has read and understood the full document in its original form.
+    """
+    return _counted_answer(prompt)
+
+
+def _counted_answer(prompt):
+    """Asks the model and counts the tokens Ollama reports towards the summary.
+
+    Raises GenerationFailed instead of answering with FALLBACK_ANSWER, so a failed
+    call is never cached as a group's summary and the job fails and can be retried.
+    """
+    response = request_ollama_response(prompt)
+    record_usage(response.get("prompt_eval_count"), response.get("eval_count"))
+    return response["message"]["content"]
+
+
+# Function to store chunks in Supabase
+def store_pdf_batch(pdf_name, chunks, first_index):
+    """Embeds and stores one batch of a PDF's chunks in Supabase and adds them to corpus search."""
+    texts = [chunk.text for chunk in chunks]
+    embeddings = store_chunks("pdf_chunks", texts, "chunk_text", {"pdf_name": pdf_name},
+                              first_index=first_index, delete_stale=False,
+                              chunk_fields=[{"page": chunk.page} for chunk in chunks])
+    corpus_index.add_rows([
+        {"source": "pdf", "document": pdf_name, "kind": "pdf_chunk", "chunk_index": i, "text": text}
+        for i, text in enumerate(texts, start=first_index)
+    ], embeddings, batch=f"chunks-{first_index}")
+
+def ingest_pdf(file_path, pdf_name, checkpoints, progress, batch_size=PDF_STREAM_BATCH):
+    """Streams a PDF through extraction, embedding, storage and the summary's map step.
+
+    Pages are extracted by a process pool and their chunks handled batch_size at a
+    time as they arrive, so memory stays flat however many pages there are.
+    Returns the summary, its per-level report and the number of chunks.
+    """
+    stored_batches = checkpoints.get("stored_batches", 0)
+    if stored_batches == 0:
+        corpus_index.remove_document("pdf", pdf_name)
+    total_pages = max(page_count(file_path), 1)
+
+    summarizer = StreamingSummary(summarize_section, summarize_document, "pdf_section")
+    chunks = stream_pdf_chunks(file_path)
+    chunk_count = 0
+    try:
+        for batch_number in itertools.count():
+            with stage("extraction") as recorder:
+                batch = list(itertools.islice(chunks, batch_size))
+                recorder.add(bytes=sum(len(chunk.text) for chunk in batch), chunks=len(batch))
+            if not batch:
+                break
+            summarizer.add(chunk.text for chunk in batch)
+            # Batches stored before a retry are re-read only for the summary, whose groups are cached
+            if batch_number >= stored_batches:
+                store_pdf_batch(pdf_name, batch, chunk_count)
+                checkpoints.put("stored_batches", batch_number + 1)
+            chunk_count += len(batch)
+            progress("extraction", 0.05 + 0.75 * batch[-1].page / total_pages)
+    except BaseException:
+        summarizer.close()
+        raise
+    log_event("db_write", pdf_name=pdf_name, stored_chunks=chunk_count)
+
+    delete_stale_chunks("pdf_chunks", {"pdf_name": pdf_name}, chunk_count)
+    # Rows were replaced rather than appended, so every process rebuilds its index
+    drop_index(("pdf", pdf_name))
+
+    progress("summary", 0.8)
+    with stage("summary") as recorder:
+        summary, summary_levels = summarizer.finish()
+        recorder.add(tokens=total_tokens(summary_levels))
+    return summary, summary_levels, chunk_count
+
+def process_pdf_upload(payload, progress):
+    """Job handler: chunks, summarizes and stores an uploaded PDF.
+
+    Stored batches and the summary are checkpointed and every write is an upsert,
+    so a failed job can be retried without redoing work or duplicating rows.
+    """
+    file_path = payload["file_path"]
+    pdf_name = payload["pdf_name"]
+    checkpoints = JobCheckpoints(payload["job_id"])
+
+    progress("extraction", 0.05)
+    ingested = checkpoints.get("ingested")
+    if ingested is None:
+        ingested = ingest_pdf(file_path, pdf_name, checkpoints, progress)
+        checkpoints.put("ingested", ingested)
+    summary, summary_levels, chunk_count = ingested
+
+    # Store this in Supabase if needed (one row per PDF, needs a unique pdf_name):
+    progress("storage", 0.9)
+    supabase.table("pdf_metadata").upsert({
+    "pdf_name": pdf_name,
+    "summary": summary
+    }, on_conflict="pdf_name").execute()
+    if not checkpoints.get("summary_indexed"):
+        corpus_index.add_rows([
+            {"source": "pdf", "document": pdf_name, "kind": "pdf_summary", "chunk_index": 0, "text": summary}
+        ], [embedder.encode(summary)], batch="summary")
+        checkpoints.put("summary_indexed", True)
+
+    return {"file_name": pdf_name, "chunks": chunk_count, "summary_levels": summary_levels,
+            "summary_tokens": total_tokens(summary_levels)}
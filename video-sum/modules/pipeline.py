@@ -0,0 +1,93 @@
+import os
+import shutil
+from modules.video_processing import extract_media
+from modules.audio_transcriber import transcribe_audio_segments
+from modules.image_processor import process_frames
+from modules.summarizer import get_long_summary
+from modules.database import store_knowledge
+from modules.checkpoints import JobCheckpoints
+from modules.metrics import stage
+from modules.hierarchical_summary import estimate_tokens, total_tokens
+from modules.stage_cache import cache_get, cache_put, content_key, file_hash
+from config.settings import (
+    FRAME_FPS, FRAME_SCENE_THRESHOLD, FRAME_HASH_DISTANCE, VISION_CONTEXT_SECONDS, VISION_STITCH,
+)
+
+def extract_and_describe(video_path, progress, checkpoints):
+    """Runs the media stages of the pipeline, checkpointing each one.
+
+    Extracted audio and frames are kept in the job's scratch directory, so a retry
+    skips finished stages and resumes unfinished ones at the first missing chunk or batch.
+    """
+    media_dir = os.path.join(checkpoints.work_dir, "media")
+
+    progress("extraction", 0.05)
+    extracted = checkpoints.get("extraction")
+    if extracted is not None and checkpoints.get("vision") is None and not os.path.isdir(extracted[1]):
+        extracted = None  # Scratch space was wiped (e.g. a RAM disk after a reboot) while still needed
+    if extracted is None:
+        # Whatever an interrupted extraction left behind is incomplete
+        shutil.rmtree(media_dir, ignore_errors=True)
+        os.makedirs(media_dir)
+        with stage("extraction") as recorder:
+            extracted = extract_media(video_path, media_dir)
+            recorder.add(bytes=os.path.getsize(video_path), frames=extracted[2]["kept"], dropped_frames=extracted[2]["dropped"])
+        checkpoints.put("extraction", extracted)
+    audio_path, frames_folder, frame_stats = extracted
+
+    progress("transcription", 0.15)
+    transcribed = checkpoints.get("transcription")
+    if transcribed is None:
+        with stage("transcription") as recorder:
+            audio_bytes = os.path.getsize(audio_path) if os.path.exists(audio_path) else 0
+            transcribed = transcribe_audio_segments(audio_path, checkpoints=checkpoints)
+            recorder.add(bytes=audio_bytes, tokens=estimate_tokens(transcribed[0]), segments=len(transcribed[1]))
+        checkpoints.put("transcription", transcribed)
+    transcription, segments = transcribed
+
+    progress("vision", 0.4)
+    frame_data = checkpoints.get("vision")
+    if frame_data is None:
+        with stage("vision") as recorder:
+            frame_data = process_frames(frames_folder, transcription, segments, checkpoints)
+            recorder.add(tokens=estimate_tokens(frame_data), frames=frame_stats["kept"])
+        checkpoints.put("vision", frame_data)
+
+    return {"transcription": transcription, "segments": segments, "frame_data": frame_data, "frame_stats": frame_stats}
+
+def process_video(payload, progress):
+    """Job handler: runs the full ingestion pipeline for an uploaded video.
+
+    The job queue deletes the upload once the job is recorded as done, so a failed
+    job can be retried. The upload's hash is checkpointed, and later stages never
+    read the upload again.
+    """
+    video_path = payload["video_path"]
+    video_filename = payload["video_filename"]
+    checkpoints = JobCheckpoints(payload["job_id"])
+
+    # Re-uploads (even under another name) skip extraction, transcription and vision entirely
+    media_key = checkpoints.memo("media_key", lambda: content_key(
+        file_hash(video_path), FRAME_FPS, FRAME_SCENE_THRESHOLD, FRAME_HASH_DISTANCE,
+        VISION_CONTEXT_SECONDS, VISION_STITCH,
+    ))
+    media = cache_get("video_media", media_key)
+    if media is None:
+        media = extract_and_describe(video_path, progress, checkpoints)
+        cache_put("video_media", media_key, media)
+    transcription, frame_data, frame_stats = media["transcription"], media["frame_data"], media["frame_stats"]
+
+    progress("summary", 0.8)
+    summarized = checkpoints.get("summary")
+    if summarized is None:
+        with stage("summary") as recorder:
+            summarized = get_long_summary(transcription)
+            recorder.add(tokens=total_tokens(summarized[1]))
+        checkpoints.put("summary", summarized)
+    summary, summary_levels = summarized
+
+    progress("storage", 0.9)
+    store_knowledge(video_filename, transcription, frame_data, summary, media.get("segments"))
+
+    return {"summary": summary, "frames": frame_stats, "summary_levels": summary_levels,
+            "summary_tokens": total_tokens(summary_levels)}
@@ -0,0 +1,38 @@
+from flask import Blueprint, request, jsonify
+from config.settings import embedder
+from modules import corpus_index
+from modules.embedding_service import EmbeddingQueueFull
+from modules.metrics import stage
+
+search_blueprint = Blueprint("search", __name__)
+
+@search_blueprint.route("/search", methods=["POST"])
+def corpus_search():
+    """Searches every ingested video and PDF; optional filters: sources, documents, kinds."""
+    data = request.json or {}
+    query = data.get("query")
+    if not query:
+        return jsonify({"error": "Missing query!"}), 400
+
+    filters = {name: data.get(name) for name in ("sources", "documents", "kinds")}
+    for name, value in filters.items():
+        if value is not None and not isinstance(value, list):
+            return jsonify({"error": f"{name} must be a list!"}), 400
+    try:
+        top_k = int(data.get("top_k", 10))
+    except (TypeError, ValueError):
+        return jsonify({"error": "top_k must be an integer!"}), 400
+
+    with stage("retrieval") as recorder:
+        results = corpus_index.search(embedder.encode(query), top_k, **filters)
+        recorder.add(chunks=len(results))
+    return jsonify({"results": results}), 200
+
+@search_blueprint.route("/search/stats", methods=["GET"])
+def corpus_stats():
+    return jsonify(corpus_index.stats()), 200
+
+# Registered on the whole app, so every route that embeds text answers 503 when the batcher is full
+@search_blueprint.app_errorhandler(EmbeddingQueueFull)
+def embedding_queue_full(e):
+    return jsonify({"error": str(e)}), 503
@@ -0,0 +1,93 @@
+import hashlib
+import os
+import pickle
+import threading
+import uuid
+from config.settings import CACHE_DIR, CACHE_MAX_BYTES
+
+_MISSING = object()
+_written_since_scan = CACHE_MAX_BYTES  # Forces a size scan on the first write
+_lock = threading.Lock()
+
+def file_hash(path, block_size=1 << 20):
+    """SHA-256 of a file's contents, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def content_key(*parts):
+    """Cache key for any mix of str/bytes inputs."""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode("utf-8")
+        digest.update(len(data).to_bytes(8, "little"))
+        digest.update(data)
+    return digest.hexdigest()
+
+def _entry_path(stage, key):
+    return os.path.join(CACHE_DIR, stage, key[:2], key + ".pkl")
+
+def cache_get(stage, key, default=None):
+    """Returns the cached output for (stage, key), marking it recently used."""
+    path = _entry_path(stage, key)
+    try:
+        with open(path, "rb") as f:
+            value = pickle.load(f)
+        os.utime(path)
+        return value
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        return default
+
+def cache_put(stage, key, value):
+    """Stores a stage output, evicting least recently used entries past CACHE_MAX_BYTES."""
+    global _written_since_scan
+    path = _entry_path(stage, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    size = os.path.getsize(tmp_path)
+    os.replace(tmp_path, path)
+
+    with _lock:
+        _written_since_scan += size
+        # Scanning the whole cache is only worth it once a noticeable amount has been written
+        if _written_since_scan >= CACHE_MAX_BYTES // 20:
+            _written_since_scan = 0
+            evict()
+
+def cached(stage, key, compute):
+    """Returns the cached output for (stage, key), computing and storing it on a miss."""
+    value = cache_get(stage, key, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        cache_put(stage, key, value)
+    return value
+
+def evict(max_bytes=CACHE_MAX_BYTES):
+    """Deletes least recently used entries until the cache fits in max_bytes."""
+    entries = []
+    total = 0
+    for root, _, files in os.walk(CACHE_DIR):
+        for name in files:
+            if not name.endswith(".pkl"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
@@ -0,0 +1,13 @@
+from flask import Blueprint, jsonify
+from config.settings import embedder
+from modules import answer_cache
+
+stats_blueprint = Blueprint("stats", __name__)
+
+@stats_blueprint.route("/answer_cache", methods=["GET"])
+def answer_cache_stats():
+    return jsonify(answer_cache.stats()), 200
+
+@stats_blueprint.route("/embedding_stats", methods=["GET"])
+def embedding_stats():
+    return jsonify(embedder.stats()), 200
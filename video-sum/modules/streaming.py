@@ -0,0 +1,41 @@
+import json
+from flask import Response, stream_with_context
+
+def wants_stream(request):
+    """True when the client asked for a streamed answer (flag or Accept header)."""
+    flag = request.values.get("stream")
+    if flag is None and request.is_json:
+        flag = (request.get_json(silent=True) or {}).get("stream")
+    if isinstance(flag, str):
+        flag = flag.lower() in ("1", "true", "yes")
+    return bool(flag) or "text/event-stream" in request.headers.get("Accept", "")
+
+def sse_response(tokens, on_complete=None, **extra):
+    """Streams tokens as server-sent events, ending with a done event.
+
+    on_complete receives the full text only if the stream finished; when tokens
+    raises, the done event carries the error instead and on_complete is skipped.
+    """
+    def events():
+        parts = []
+        try:
+            for token in tokens:
+                parts.append(token)
+                yield f"data: {json.dumps({'token': token})}\n\n"
+        except Exception as e:
+            yield f"data: {json.dumps({'done': True, 'error': str(e), **extra})}\n\n"
+            return
+        finally:
+            # Also runs when the client disconnects, so the model stream stops with it
+            if hasattr(tokens, "close"):
+                tokens.close()
+        answer = "".join(parts)
+        if on_complete is not None:
+            on_complete(answer)
+        yield f"data: {json.dumps({'done': True, **extra})}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
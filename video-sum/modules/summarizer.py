@@ -1,6 +1,11 @@
-from groq import Groq
+from config.settings import groq_client
+from modules.stage_cache import cached, cache_get, cache_put, content_key
+from modules.hierarchical_summary import map_reduce_summary, record_usage
+from modules.data_chunk import chunk_text
 
-client = Groq()
+client = groq_client
+
+SUMMARY_MODEL = "llama-3.3-70b-versatile"
 
 system_prompt = """
 Start with a warm introduction that draws the audience in, establishing the subject matter in a way that piques interest.
@@ -16,12 +21,64 @@ The video concludes with a reflective ending, providing a sense of closure and l
 
 def get_summary(prompt):
     """Generates summary using LLM."""
+    return cached("summary", content_key(SUMMARY_MODEL, system_prompt, prompt), lambda: _request_summary(prompt))
+
+def _request_summary(prompt):
     chat_completion = client.chat.completions.create(
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": prompt}
         ],
-        model="llama-3.3-70b-versatile",
+        model=SUMMARY_MODEL,
     )
+    _record_usage(chat_completion)
+    return chat_completion.choices[0].message.content
+
+section_prompt = """
+Summarize this section of a video transcript. Keep the key ideas, names, numbers and the order in which they are discussed.
+"""
 
+def _summarize_section(text):
+    chat_completion = client.chat.completions.create(
+        messages=[
+            {"role": "system", "content": section_prompt},
+            {"role": "user", "content": text}
+        ],
+        model=SUMMARY_MODEL,
+    )
+    _record_usage(chat_completion)
     return chat_completion.choices[0].message.content
+
+def _record_usage(chat_completion):
+    usage = getattr(chat_completion, "usage", None)
+    if usage is not None:
+        record_usage(usage.prompt_tokens, usage.completion_tokens)
+
+def get_long_summary(transcription):
+    """Summarizes a transcript of any length; returns the summary and a per-level report."""
+    chunks = chunk_text(transcription, max_chunk_size=2000)
+    return map_reduce_summary(chunks, _summarize_section, get_summary, "summary_section")
+
+def stream_summary(prompt):
+    """Yields the summary incrementally; a cached summary is yielded whole."""
+    key = content_key(SUMMARY_MODEL, system_prompt, prompt)
+    summary = cache_get("summary", key)
+    if summary is not None:
+        yield summary
+        return
+
+    parts = []
+    stream = client.chat.completions.create(
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ],
+        model=SUMMARY_MODEL,
+        stream=True,
+    )
+    for chunk in stream:
+        token = chunk.choices[0].delta.content
+        if token:
+            parts.append(token)
+            yield token
+    cache_put("summary", key, "".join(parts))
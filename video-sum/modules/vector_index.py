@@ -0,0 +1,174 @@
+import hashlib
+import os
+import threading
+import uuid
+import numpy as np
+from config.settings import INDEX_STAMP_DIR, HYBRID_SEARCH, HYBRID_CANDIDATES, RRF_K
+from modules.lexical_index import BM25Index, reciprocal_rank_fusion
+
+try:
+    import hnswlib  # Optional ANN backend for very large documents
+except ImportError:
+    hnswlib = None
+
+# Above this many chunks an HNSW graph is used instead of the exact matrix scan
+ANN_THRESHOLD = 100_000
+
+
+def normalize(embeddings):
+    """Returns embeddings as a float32 matrix of unit-length rows."""
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class VectorIndex:
+    """In-process cosine index over one document's chunk embeddings, with a BM25 index of the same chunks."""
+
+    def __init__(self, ann_threshold=ANN_THRESHOLD):
+        self.matrix = None
+        self.texts = []
+        self.lexical = BM25Index()
+        self.ann_threshold = ann_threshold
+        self._ann = None
+        self._lock = threading.Lock()
+        self.stamp = ""
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add(self, embeddings, texts):
+        """Appends embeddings (one row per text) to the index."""
+        texts = list(texts)
+        if not texts:
+            return
+        rows = normalize(embeddings)
+        with self._lock:
+            start = len(self.texts)
+            self.matrix = rows if self.matrix is None else np.vstack([self.matrix, rows])
+            self.texts.extend(texts)
+            self.lexical.add(texts)
+            if self._ann is not None:
+                self._ann.resize_index(len(self.texts))
+                self._ann.add_items(rows, np.arange(start, len(self.texts)))
+            elif hnswlib is not None and len(self.texts) >= self.ann_threshold:
+                self._build_ann()
+
+    def _build_ann(self):
+        ann = hnswlib.Index(space="ip", dim=self.matrix.shape[1])
+        ann.init_index(max_elements=len(self.texts), ef_construction=200, M=16)
+        ann.add_items(self.matrix, np.arange(len(self.texts)))
+        ann.set_ef(64)
+        self._ann = ann
+
+    def _dense_search(self, query_embedding, top_k):
+        """Returns up to top_k (similarity, chunk number) pairs, best first."""
+        if not self.texts or top_k <= 0:
+            return []
+        query = normalize(query_embedding)[0]
+        k = min(top_k, len(self.texts))
+
+        if self._ann is not None:
+            labels, distances = self._ann.knn_query(query, k=k)
+            # hnswlib's "ip" space reports 1 - dot product as the distance
+            return [(1.0 - float(d), int(i)) for i, d in zip(labels[0], distances[0])]
+
+        scores = self.matrix @ query
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), int(i)) for i in top]
+
+    def search(self, query_embedding, top_k=5):
+        """Returns up to top_k (similarity, text) pairs, best first."""
+        return [(score, self.texts[i]) for score, i in self._dense_search(query_embedding, top_k)]
+
+    def hybrid_search(self, query, query_embedding, top_k=5, candidates=HYBRID_CANDIDATES, rrf_k=RRF_K):
+        """Returns up to top_k (fused score, text) pairs ranked by BM25 and cosine similarity together.
+
+        Exact terms (names, numbers, identifiers) that embeddings blur still rank highly.
+        """
+        candidates = max(candidates, top_k)
+        dense = [i for _, i in self._dense_search(query_embedding, candidates)]
+        lexical = [i for _, i in self.lexical.search(query, candidates)]
+        fused = reciprocal_rank_fusion([dense, lexical], rrf_k)
+        return [(score, self.texts[i]) for i, score in fused[:top_k]]
+
+    def query(self, query, query_embedding, top_k=5):
+        """Best top_k texts for a question, using hybrid search unless HYBRID_SEARCH is off."""
+        if HYBRID_SEARCH:
+            return [text for _, text in self.hybrid_search(query, query_embedding, top_k)]
+        return [text for _, text in self.search(query_embedding, top_k)]
+
+
+_indexes = {}
+_load_locks = {}
+_registry_lock = threading.Lock()
+
+
+def _stamp_path(key):
+    return os.path.join(INDEX_STAMP_DIR, hashlib.sha1(repr(key).encode()).hexdigest())
+
+
+def _read_stamp(key):
+    try:
+        with open(_stamp_path(key)) as f:
+            return f.read()
+    except FileNotFoundError:
+        return ""
+
+
+def _touch_stamp(key):
+    os.makedirs(INDEX_STAMP_DIR, exist_ok=True)
+    stamp = uuid.uuid4().hex
+    # Write then rename so readers never see a half-written stamp
+    tmp_path = f"{_stamp_path(key)}.{stamp}"
+    with open(tmp_path, "w") as f:
+        f.write(stamp)
+    os.replace(tmp_path, _stamp_path(key))
+    return stamp
+
+
+def index_stamp(key):
+    """Opaque marker that changes whenever a document is (re-)ingested by any process."""
+    return _read_stamp(key)
+
+
+def get_index(key, loader):
+    """Returns the index for key, building it from loader() on first use.
+
+    loader must return an (embeddings, texts) pair read from the source of truth.
+    The index is rebuilt when another process has written to the document since.
+    """
+    stamp = _read_stamp(key)
+    with _registry_lock:
+        index = _indexes.get(key)
+        if index is not None and index.stamp == stamp:
+            return index
+        load_lock = _load_locks.setdefault(key, threading.Lock())
+
+    # Only requests for the same document wait for its load; others carry on
+    with load_lock:
+        with _registry_lock:
+            index = _indexes.get(key)
+        if index is not None and index.stamp == stamp:
+            return index  # Loaded by another thread while we waited
+        index = VectorIndex()
+        index.stamp = stamp
+        embeddings, texts = loader()
+        index.add(embeddings, texts)
+        with _registry_lock:
+            _indexes[key] = index
+    return index
+
+
+def drop_index(key):
+    """Forgets the cached index for key so every process rebuilds it on next use."""
+    with _registry_lock:
+        _indexes.pop(key, None)
+        _touch_stamp(key)
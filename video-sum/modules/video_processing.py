@@ -1,13 +1,77 @@
 import os
+import subprocess
+import numpy as np
+from PIL import Image
+from config.settings import FRAME_FPS, FRAME_SCENE_THRESHOLD, FRAME_HASH_DISTANCE
+from modules.metrics import log_event
 
-def get_frames(video_path):
-    """Extract frames from the video."""
-    frames_folder = os.path.join(os.path.dirname(__file__), "../static/frames")
-    os.makedirs(frames_folder, exist_ok=True)
-    os.system(f'ffmpeg -i "{video_path}" -vf "fps=0.67" "{os.path.join(frames_folder, "frame_%04d.jpeg")}"')
+def _frame_filter(fps, scene_threshold):
+    """ffmpeg video filter sampling at fps, optionally keeping only scene changes."""
+    if scene_threshold > 0:
+        return f"fps={fps},select=gt(scene\\,{scene_threshold})"
+    return f"fps={fps}"
+
+def _frame_args(frames_folder, fps, scene_threshold):
+    # -frame_pts numbers each file by its pts in the fps filter's 1/fps time base,
+    # so frame_N.jpeg was taken at N / fps seconds even after scene selection
+    return [
+        "-map", "0:v:0?", "-vf", _frame_filter(fps, scene_threshold),
+        "-fps_mode", "vfr", "-frame_pts", "1",
+        os.path.join(frames_folder, "frame_%04d.jpeg"),
+    ]
+
+def _audio_args(audio_folder):
+    # Whisper works on 16 kHz mono, so there is no point writing anything larger
+    return ["-map", "0:a:0?", "-vn", "-ac", "1", "-ar", "16000", os.path.join(audio_folder, "output.wav")]
+
+def _run_ffmpeg(args):
+    subprocess.run(["ffmpeg", "-y", "-loglevel", "error", *args], check=True)
+
+def frame_timestamp(frame_path, fps=FRAME_FPS):
+    """Seconds into the video at which an extracted frame was taken."""
+    return int(os.path.basename(frame_path).split('_')[1].split('.')[0]) / fps
+
+def _dhash(frame_path, size=8):
+    """64-bit difference hash of a frame, robust to compression noise."""
+    with Image.open(frame_path) as image:
+        pixels = np.asarray(image.convert("L").resize((size + 1, size)), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int("".join("1" if bit else "0" for bit in bits), 2)
 
-def get_audio(video_path):
-    """Extract audio from the video."""
-    audio_folder = os.path.join(os.path.dirname(__file__), "../static/audio")
+def drop_duplicate_frames(frames_folder, max_distance=FRAME_HASH_DISTANCE):
+    """Deletes frames nearly identical to the last kept one; returns (kept, dropped)."""
+    frames = sorted(os.listdir(frames_folder), key=lambda x: int(x.split('_')[1].split('.')[0]))
+    if max_distance <= 0:
+        return len(frames), 0
+
+    kept, dropped = 0, 0
+    last_hash = None
+    for frame in frames:
+        frame_path = os.path.join(frames_folder, frame)
+        frame_hash = _dhash(frame_path)
+        if last_hash is not None and bin(frame_hash ^ last_hash).count("1") <= max_distance:
+            os.remove(frame_path)
+            dropped += 1
+        else:
+            last_hash = frame_hash
+            kept += 1
+    return kept, dropped
+
+def extract_media(video_path, work_dir, fps=FRAME_FPS, scene_threshold=FRAME_SCENE_THRESHOLD):
+    """Extracts audio and frames into work_dir with a single ffmpeg decode, then drops near-duplicate frames.
+
+    Returns the audio path, the frames folder and a {"kept", "dropped"} frame count report.
+    """
+    frames_folder = os.path.join(work_dir, "frames")
+    audio_folder = os.path.join(work_dir, "audio")
+    os.makedirs(frames_folder, exist_ok=True)
     os.makedirs(audio_folder, exist_ok=True)
-    os.system(f'ffmpeg -i "{video_path}" -vn "{os.path.join(audio_folder, "output.wav")}"')
+    _run_ffmpeg([
+        "-i", video_path,
+        *_audio_args(audio_folder),
+        *_frame_args(frames_folder, fps, scene_threshold),
+    ])
+
+    kept, dropped = drop_duplicate_frames(frames_folder)
+    log_event("extraction", frames_kept=kept, frames_dropped=dropped)
+    return os.path.join(audio_folder, "output.wav"), frames_folder, {"kept": kept, "dropped": dropped}
@@ -0,0 +1,43 @@
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from config.settings import SCRATCH_DIR, SCRATCH_IN_RAM
+
+RAM_DISK = "/dev/shm"
+
+def scratch_root():
+    """Parent directory for job scratch space."""
+    if SCRATCH_IN_RAM and os.path.isdir(RAM_DISK) and os.access(RAM_DISK, os.W_OK):
+        return RAM_DISK
+    if SCRATCH_DIR:
+        os.makedirs(SCRATCH_DIR, exist_ok=True)
+    return SCRATCH_DIR
+
+@contextmanager
+def job_workspace(prefix="job-"):
+    """Yields a private scratch directory that is always removed afterwards."""
+    work_dir = tempfile.mkdtemp(prefix=prefix, dir=scratch_root())
+    try:
+        yield work_dir
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+JOB_SCRATCH_PREFIX = "insightai-job-"
+
+def job_scratch_dir(job_id, create=True):
+    """Scratch directory of one job that, unlike job_workspace, outlives a failed attempt.
+
+    JobCheckpoints.clear removes it once the job succeeds or expires.
+    """
+    path = os.path.join(scratch_root() or tempfile.gettempdir(), JOB_SCRATCH_PREFIX + job_id)
+    if create:
+        os.makedirs(path, exist_ok=True)
+    return path
+
+def unique_upload_path(folder, filename):
+    """Path in folder for an uploaded file that cannot clash with a concurrent upload."""
+    os.makedirs(folder, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix="-" + os.path.basename(filename), dir=folder)
+    os.close(fd)
+    return path
@@ -1,117 +1,44 @@
 import os
-import fitz  # PyMuPDF
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from flask import Flask, request, jsonify
-import json
-from config.settings import supabase, embedding_model
-from modules.ollama_helper import get_ollama_response as generate_answer_from_model
+from config.settings import supabase, embedder, WARM_UP_SERVICES
+from config.services import warm_up
+from modules.ollama_helper import get_ollama_response as generate_answer_from_model, stream_ollama_response, FALLBACK_ANSWER
+from modules.streaming import wants_stream, sse_response
+from modules import answer_cache
+from modules.vector_index import get_index
+from modules.embedding_codec import decode_embeddings
+from modules.job_queue import enqueue, start_workers
+from modules.job_routes import jobs_blueprint
+from modules.metrics_routes import metrics_blueprint
+from modules.search_routes import search_blueprint
+from modules.stats_routes import stats_blueprint
+from modules.metrics import stage
+from modules.workspace import unique_upload_path
 
 # Initialize Flask app and the model
 app = Flask(__name__)
+app.register_blueprint(jobs_blueprint)
+app.register_blueprint(metrics_blueprint)
+app.register_blueprint(search_blueprint)
+app.register_blueprint(stats_blueprint)
 
+# Build the configured services before serving (and before forking job workers)
+if WARM_UP_SERVICES:
+    warm_up(*WARM_UP_SERVICES)
 
-def extract_text_from_pdf(pdf_path):
-    """Extracts text from all pages using 'blocks' for better accuracy."""
-    doc = fitz.open(pdf_path)
-    page_texts = {}
-    print(f"Extracting text from {pdf_path} with pages = {len(doc)}")  # Debugging line
 
-    for page_num in range(len(doc)):  # Ensure all pages are processed
-        text = doc[page_num].get_text("blocks")
-        combined_text = "\n".join([block[4] for block in text])  # Extract text content
-        if combined_text.strip():  # Skip empty pages
-            page_texts[page_num + 1] = combined_text  # Store with page number
-
-    return page_texts  # Dictionary {page_num: text}
-
-# --- Chunking Process ---
-def chunk_pdf_text(pdf_path, chunk_size=1000, overlap=200):
-    """Splits extracted text into chunks for vector search."""
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=overlap)
-    page_texts = extract_text_from_pdf(pdf_path)
-
-    chunks = []
-
-    for page_num, page_text in page_texts.items():
-        page_chunks = text_splitter.split_text(page_text)
-        for chunk in page_chunks:
-            chunks.append(chunk)
-
-    return chunks
-
-
-def generate_summary(chunks):
-    content = "\n".join(chunks)  # summarizing only first few chunks for performance
-    prompt = f"""
-    Summarize the following document content:
-
-    {content}
-    Summary Instructions:
-
-    Please generate a detailed and coherent summary of the above document, analyzing it as a complete work (e.g., book, research paper, or report) — not just as raw text or segmented chunks.
-
-    Your summary should include:
-
-    Document Identity:
-
-    Title (if identifiable)
-
-    Author(s)
-
-    Type of document (e.g., book, report, academic paper, manual)
-
-    Date of publication (if present)
-
-    Main Purpose:
-
-    What is the primary aim or objective of this document?
-
-    Who is the intended audience?
-
-    Content Overview:
-
-    Key topics and themes covered
-
-    Structure of the content (chapters, sections, flow of arguments)
-
-    Any important conclusions, takeaways, or findings
-
-    Contextual Insight:
-
-    If the document is a book, summarize it as such — highlighting narrative structure, core messages, or lessons.
-
-    If it is academic or technical, identify the problem it addresses, the methodology used, and the results or insights.
-
-    Avoid referring to internal data processing concepts like “chunks.” The summary should read naturally and professionally, as if written by someone who has read and understood the full document in its original form.
-    """
-    summary = generate_answer_from_model(prompt)
-    return summary["message"]["content"]
-
-
-# Function to calculate cosine similarity
-def cosine_similarity(embedding1, embedding2):
-    # This should return a similarity score (e.g., dot product or cosine similarity)
-    dot_product = sum(a * b for a, b in zip(embedding1, embedding2))
-    norm1 = sum(a * a for a in embedding1) ** 0.5
-    norm2 = sum(b * b for b in embedding2) ** 0.5
-    return dot_product / (norm1 * norm2) if norm1 and norm2 else 0
+# Function to load a PDF's stored embeddings into the in-process vector index
+def load_pdf_embeddings(pdf_name):
+    response = supabase.table("pdf_chunks").select("chunk_text, embedding").eq("pdf_name", pdf_name).execute()
+    rows = response.data or []
+    embeddings = decode_embeddings([row['embedding'] for row in rows])
+    return embeddings, [row['chunk_text'] for row in rows]
 
 # Function to generate answer from Ollama or LLM
 # def generate_answer_from_model(question, context):
 #     # Call Ollama API or any other LLM model with the question and context
 #     return "Generated answer based on the context"
 
-# Function to store chunks in Supabase
-def store_pdf_chunks(pdf_name, chunks, embeddings):
-    """Store PDF chunks and embeddings in Supabase."""
-    for chunk, embedding in zip(chunks, embeddings):
-        supabase.table("pdf_chunks").insert({
-            "chunk_text": chunk,
-            "embedding": json.dumps(embedding.tolist()),  # Store as a JSON list
-            "pdf_name": pdf_name,
-        }).execute()
-    print(f"Stored {len(chunks)} chunks for {pdf_name} in the database.")  # Debugging line
-
 # Single endpoint for both uploading the PDF and asking the question
 @app.route('/pdf_query', methods=['POST'])
 def pdf_query():
@@ -126,73 +53,60 @@ def pdf_query():
             return jsonify({"error": "No selected file"}), 400
         
         # Save PDF to a temporary location
-        file_path = os.path.join("static/pdf", file.filename)
-        if not os.path.exists("static/pdf"):
-            os.makedirs("static/pdf")
+        file_path = unique_upload_path("static/pdf", file.filename)
         file.save(file_path)
-        print(f"Saved file to {file_path}")  # Debugging line
-
-        # Extract chunks from the PDF
-        chunks = chunk_pdf_text(file_path)
-        print(f"Extracted {len(chunks)} chunks from the PDF.")  # Debugging line
-
-        # Create embeddings for each chunk
-        embeddings = embedding_model.encode(chunks)
-
-        summary = generate_summary(chunks)
-        # Store this in Supabase if needed:
-        supabase.table("pdf_metadata").insert({
-        "pdf_name": file.filename,
-        "summary": summary
-        }).execute()
-
 
-        # Store chunks and embeddings in the Supabase database using the helper function
-        store_pdf_chunks(file.filename, chunks, embeddings)
-        print("done 2")
+        job_id = enqueue("modules.pdf_pipeline:process_pdf_upload", {"file_path": file_path, "pdf_name": file.filename},
+                         uploads=[file_path])
 
-        return jsonify({"message": "Upload successful", "file_name": file.filename}), 200
+        return jsonify({"message": "Upload queued", "file_name": file.filename, "job_id": job_id, "status_url": f"/jobs/{job_id}"}), 202
 
     elif question and pdf_name:
         # If a question is provided, retrieve relevant chunks and generate an answer
-        response = supabase.table("pdf_chunks").select("chunk_text, embedding").eq("pdf_name", pdf_name).execute()
-
-        if response.data:
-            rows = response.data
-        else:
+        with stage("retrieval") as recorder:
+            index = get_index(("pdf", pdf_name), lambda: load_pdf_embeddings(pdf_name))
+            recorder.add(chunks=len(index))
+        if not len(index):
             return jsonify({"error": "No data found for the provided pdf_name"}), 404
 
         # Convert the question to embedding
-        question_embedding = embedding_model.encode([question])[0]
-
-        # Find the most relevant chunk by calculating cosine similarity
-        top_chunks = []
-        max_similarity = -1
-        for row in rows:
-            chunk_text = row['chunk_text']
-            chunk_embedding = json.loads(row['embedding'])  # Parse JSON-encoded embedding
-            similarity = cosine_similarity(question_embedding, chunk_embedding)
-            top_chunks.append((similarity, chunk_text))
-            # Sort chunks by similarity in descending order
-        top_chunks.sort(reverse=True, key=lambda x: x[0])
-
-        # Get the top 10 most similar chunks
-        best_chunk = [chunk for similarity, chunk in top_chunks[:10]]
+        question_embedding = embedder.encode([question])[0]
+
+        # Reuse the answer to a near-identical question about the same PDF
+        cached_answer = answer_cache.lookup(("pdf", pdf_name), question_embedding)
+        stream = wants_stream(request)
+        if cached_answer is not None:
+            if stream:
+                return sse_response([cached_answer], cached=True)
+            return jsonify({"answer": cached_answer, "cached": True}), 200
+
+        # Get the top 10 chunks by meaning and by exact terms
+        best_chunk = index.query(question, question_embedding, 10)
 
         chunk = "\n".join(best_chunk)
         
         response_sum = supabase.table("pdf_metadata").select("summary").eq("pdf_name", pdf_name).execute()
 
-        summary = response_sum.data[0]['summary'] if response.data else None
+        summary = response_sum.data[0]['summary'] if response_sum.data else None
 
         # Generate answer using Ollama or another LLM model
         content = f"Context:\n{chunk}\n\nSummary:\n{summary}\n\nQuestion:{question}\n\nAnswer:"
-        answer = generate_answer_from_model(content)
+        if stream:
+            def remember(answer):
+                answer_cache.store(("pdf", pdf_name), question_embedding, answer)
+            return sse_response(stream_ollama_response(content), on_complete=remember)
+
+        answer = generate_answer_from_model(content)["message"]["content"]
+        if answer != FALLBACK_ANSWER:
+            answer_cache.store(("pdf", pdf_name), question_embedding, answer)
 
-        return jsonify({"answer": answer["message"]["content"]}), 200
+        return jsonify({"answer": answer}), 200
 
     else:
         return jsonify({"error": "No file or question provided"}), 400
 
 if __name__ == '__main__':
+    # The debug reloader re-runs this module in a child process; start workers only once
+    if os.environ.get("WERKZEUG_RUN_MAIN") != "true":
+        start_workers()
     app.run(debug=True)
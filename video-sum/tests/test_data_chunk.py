@@ -0,0 +1,41 @@
+from modules.data_chunk import iter_chunks, chunk_segments
+
+
+def _spans(chunks):
+    return [(chunk.start, chunk.end) for chunk in chunks]
+
+
+def test_overlap_never_repeats_a_chunk_inside_the_previous_one():
+    # The only sentence break in the second window is the one that ended the first chunk
+    text = "A" * 240 + ". " + "word " * 400
+    spans = _spans(iter_chunks(text, 1000, 200))
+    assert spans[:2] == [(0, 241), (41, 1041)]
+    for (start, end), (next_start, next_end) in zip(spans, spans[1:]):
+        assert next_start > start and next_end > end
+
+
+def test_token_overlap_never_repeats_a_chunk_inside_the_previous_one():
+    text = "one two three four five six. " + "w " * 40
+    chunks = [chunk.text for chunk in iter_chunks(text, 10, 4, unit="tokens")]
+    assert chunks[0] == "one two three four five six."
+    assert chunks[1] == "three four five six. w w w w w w"
+    spans = _spans(iter_chunks(text, 10, 4, unit="tokens"))
+    for (start, end), (next_start, next_end) in zip(spans, spans[1:]):
+        assert next_start > start and next_end > end
+
+
+def test_overlap_still_prefers_sentence_breaks():
+    text = " ".join(f"Sentence number {i} ends here." for i in range(100))
+    chunks = list(iter_chunks(text, 200, 50))
+    assert all(chunk.text.endswith(".") for chunk in chunks)
+    assert chunks[-1].end == len(text)
+
+
+def test_segment_chunks_carry_the_time_span_they_cover():
+    segments = [{"start": i * 2.0, "end": i * 2.0 + 2.0, "text": f"Segment {i} is spoken here."} for i in range(30)]
+    chunks = list(chunk_segments(segments, 100))
+    assert chunks[0].start_time == 0.0
+    assert chunks[-1].end_time == 60.0
+    for chunk in chunks:
+        first = int(chunk.text.split()[1])
+        assert chunk.start_time == first * 2.0
@@ -0,0 +1,9 @@
+from config.settings import JOB_WORKERS
+from modules.job_queue import start_workers
+
+# Runs the background job workers on their own, separate from the Flask apps
+if __name__ == "__main__":
+    workers = start_workers(JOB_WORKERS)
+    print(f"Started {len(workers)} job workers")
+    for worker in workers:
+        worker.join()